@@ -1,171 +1,316 @@
-import json
+import os
+import time
 import anyio
+import orjson
+import functools
 import pandas as pd
 import argparse
+import importlib.util
 import logging
+import logging.handlers
 from pathlib import Path
 from typing import Any, Dict, List, Protocol, Optional
 from abc import ABC, abstractmethod
+from anyio import to_thread
 
-from datasets import Dataset
 from tqdm import tqdm
-from tqdm.asyncio import tqdm as tqdm_async
 from claude_code_sdk import query, ClaudeCodeOptions, AssistantMessage, ToolUseBlock
 
 
+logger = logging.getLogger(__name__)
+
+
 class ProcessingCallback(Protocol):
     """Protocol for processing callbacks."""
     
     @abstractmethod
     def __call__(self, current_index: int, processed_results: List[Dict[str, Any]], **kwargs) -> None:
-        """Execute the callback."""
+        """
+        Execute the callback with the results completed since its previous call.
+        
+        processed_results is only that delta, not every result so far: one dict per CVE with its
+        input row "index", "cve_id", "vuln_funcs" (the JSON-serialized result) and "error_msg",
+        in completion order. current_index is the number of CVEs completed so far, minus one.
+        """
         pass
 
 
 class SaveCheckpointCallback:
-    """Callback to save processing checkpoints."""
+    """Callback to append processing checkpoints to a JSONL stream, one line per completed CVE."""
     
-    def __init__(self, save_file_format: str = "{excel_path}/{write_to}__checkpoints/chpk{n}.json"):
+    def __init__(self, save_file_format: str = "{write_to}__checkpoints/chpk.jsonl", fsync_every: int = 5):
         self.save_file_format = save_file_format
+        self.fsync_every = fsync_every  # Only force the stream to disk every N checkpoints
         self.checkpoint_counter = 0
-        self.last_checkpoint_index = -1
+        self._fp = None
     
-    def __call__(self, current_index: int, processed_results: List[Dict[str, Any]], **kwargs) -> None:
-        excel_path = kwargs.get('excel_path', '')
-        write_to = kwargs.get('write_to', 'results')
-        
-        # Create checkpoint directory
+    def _checkpoint_file(self, excel_path: str, write_to: str) -> Path:
+        # The checkpoint stream lives next to the Excel file
         excel_path_obj = Path(excel_path).parent if excel_path else Path.cwd()
-        checkpoint_dir = excel_path_obj / f"{write_to}__checkpoints"
-        checkpoint_dir.mkdir(exist_ok=True)
-        
-        # Generate checkpoint filename
-        checkpoint_file = checkpoint_dir / f"chpk{self.checkpoint_counter}.json"
-        
-        # Only save results since last checkpoint (pagination effect)
-        start_idx = self.last_checkpoint_index + 1
-        end_idx = len(processed_results)
-        checkpoint_results = processed_results[start_idx:end_idx]
+        return excel_path_obj / self.save_file_format.format(write_to=write_to)
+    
+    def _open(self, excel_path: str, write_to: str):
+        checkpoint_file = self._checkpoint_file(excel_path, write_to)
+        checkpoint_file.parent.mkdir(exist_ok=True)
+        return open(checkpoint_file, "ab", buffering=1 << 20)
+    
+    def load(self, excel_path: str, write_to: str) -> Dict[tuple, Dict[str, Any]]:
+        """Load the results saved by previous runs, keyed by (CVE index, CVE id) (later lines win)."""
+        checkpoint_file = self._checkpoint_file(excel_path, write_to)
+        if not checkpoint_file.exists():
+            return {}
         
-        # Save checkpoint data
-        checkpoint_data = {
-            "checkpoint_number": self.checkpoint_counter,
-            "start_index": start_idx,
-            "end_index": end_idx - 1,
-            "current_index": current_index,
-            "processed_results": checkpoint_results,
-            "timestamp": pd.Timestamp.now().isoformat(),
-            "batch_size": len(checkpoint_results),
-            "total_processed_so_far": len(processed_results)
-        }
+        saved = {}
+        with open(checkpoint_file, "rb") as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # Partially written line from an interrupted run
+                if "cve_id" not in entry:
+                    continue  # Written before checkpoints recorded the CVE id; cannot be matched to a row
+                saved[entry["index"], entry["cve_id"]] = entry
+        return saved
+    
+    def __call__(self, current_index: int, processed_results: List[Dict[str, Any]], **kwargs) -> None:
+        if not processed_results:
+            return  # Nothing completed since the last checkpoint
         
-        with open(checkpoint_file, 'w') as f:
-            json.dump(checkpoint_data, f)
+        if self._fp is None:
+            self._fp = self._open(kwargs.get('excel_path', ''), kwargs.get('write_to', 'results'))
         
-        logging.info(f"Checkpoint saved: {checkpoint_file} (batch: {len(checkpoint_results)} CVEs, indices {start_idx}-{end_idx-1})")
+        # processed_results only holds the results completed since the last checkpoint (the delta), which
+        # under concurrency are not a contiguous range of input rows
+        timestamp = time.time()
+        for entry in processed_results:
+            self._fp.write(orjson.dumps({**entry, "timestamp": timestamp}, option=orjson.OPT_APPEND_NEWLINE))
+        self._fp.flush()
         
-        # Update tracking
-        self.last_checkpoint_index = current_index
         self.checkpoint_counter += 1
+        if self.checkpoint_counter % self.fsync_every == 0:
+            os.fsync(self._fp.fileno())
+        
+        logger.info("Checkpoint saved: %s (batch: %d CVEs, indices %s)", self._fp.name, len(processed_results),
+                    sorted(entry["index"] for entry in processed_results))
+    
+    def close(self) -> None:
+        """Flush the checkpoint stream to disk and close it."""
+        if self._fp is not None:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._fp.close()
+            self._fp = None
 
 
-async def get_vul_funcs(cve_id: str, prompt: str):
-    options = ClaudeCodeOptions(
-        max_turns=50,
-        system_prompt="You are a security-focused code analyst. ",
-        # cwd=Path("/path/to/project"),  # Can be string or Path
-        allowed_tools=["Bash", "WebSearch", "WebFetch", "mcp__patchpeek"]
-    )
-    async for message in tqdm_async(query(prompt=prompt.format(cve_id=cve_id), options=options), leave=False):
-        if isinstance(message, AssistantMessage) and isinstance(message.content[0], ToolUseBlock):
-            if message.content[0].name == "mcp__patchpeek__VulnerableFunctionSearchFormatter":
-                return message.content[0].input
+# Stands in for the CVE id while the prompt template is rendered once; cannot occur in the prompt file
+_CVE_ID_PLACEHOLDER = "\0"
+
+# Shared by every query; the options are identical for all CVEs. allowed_tools is a tuple so that
+# no query can change the tool list of the ones after it (the SDK only joins it into a CLI flag)
+_OPTIONS = ClaudeCodeOptions(
+    max_turns=50,
+    system_prompt="You are a security-focused code analyst. ",
+    # cwd=Path("/path/to/project"),  # Can be string or Path
+    allowed_tools=("Bash", "WebSearch", "WebFetch", "mcp__patchpeek")
+)
+
+
+class TokenBucket:
+    """Token bucket used to pace requests just below the provider's rate limits."""
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # Tokens added per second
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = anyio.Lock()
+    
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        """Create a bucket that allows `limit` tokens per minute."""
+        return cls(capacity=limit, refill_rate=limit / 60)
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+    
+    async def acquire(self, cost: float = 1) -> None:
+        """Wait until `cost` tokens are available and consume them."""
+        # A single request larger than the bucket would otherwise wait forever
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            self._refill()
+            deficit = cost - self.tokens
+            if deficit > 0:
+                await anyio.sleep(deficit / self.refill_rate)
+                self._refill()
+            self.tokens -= cost
+
+
+async def get_vul_funcs(cve_id: str, prompt: str, request_bucket: Optional[TokenBucket] = None,
+                        token_bucket: Optional[TokenBucket] = None):
+    # Pace requests client-side instead of running into 429s and their backoff
+    if request_bucket is not None:
+        await request_bucket.acquire(1)
+    if token_bucket is not None:
+        await token_bucket.acquire(len(prompt) // 4)
+    
+    # Close the stream explicitly once the formatter call arrives so no further turns are generated
+    messages = query(prompt=prompt, options=_OPTIONS)
+    try:
+        async for message in messages:
+            if isinstance(message, AssistantMessage) and message.content and isinstance(message.content[0], ToolUseBlock):
+                if message.content[0].name == "mcp__patchpeek__VulnerableFunctionSearchFormatter":
+                    return message.content[0].input
+    finally:
+        await messages.aclose()
 
     raise ValueError(f"Could not retrieve structured output for {cve_id}")
 
 
+def _write_excel(df: pd.DataFrame, excel_path: Path, sheet_name: str) -> None:
+    with pd.ExcelWriter(excel_path, mode="a", if_sheet_exists="replace") as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
 async def main(input_excel_file: str, read_from: str, write_to: str = "wiz-java-claude_code", prompt: str = "", 
-               callbacks: Optional[List[ProcessingCallback]] = None, checkpoint_frequency: int = 10):
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('cve_processing.log')
-        ]
-    )
+               callbacks: Optional[List[ProcessingCallback]] = None, checkpoint_frequency: int = 10,
+               concurrency: int = 4, rpm: Optional[int] = None, tpm: Optional[int] = None,
+               resume: bool = False):
+    """
+    Process every CVE in the input sheet and write the results next to it.
+    
+    Results are not kept as a list of per-CVE dicts; callbacks receive them in batches (see
+    ProcessingCallback) and they are otherwise only stored as the output columns.
     
+    Returns:
+        The DataFrame that was written: the input sheet plus the "vuln_funcs" and "error_msg" columns
+    """
     if callbacks is None:
         callbacks = []
     
     # Read in the data from an excel file
     excel_path = Path(input_excel_file).expanduser()
-    df = pd.read_excel(excel_path, sheet_name=read_from)
+    df = await to_thread.run_sync(functools.partial(pd.read_excel, excel_path, sheet_name=read_from))
     
-    # Convert the pandas DataFrame to a HuggingFace Dataset
-    dataset = Dataset.from_pandas(df)
+    cve_ids = tuple(df["cve_id"].astype(str))
     
-    cve_ids = dataset["cve_id"]
-    
-    logging.info(f"Processing {len(cve_ids)} CVEs sequentially")
-    logging.info(f"Checkpoint frequency: every {checkpoint_frequency} CVEs")
+    logger.info("Processing %d CVEs with concurrency %d", len(cve_ids), concurrency)
+    logger.info("Checkpoint frequency: every %d CVEs", checkpoint_frequency)
 
-    processed_results: List[Dict[str, Any]] = []
+    # Results are kept only as the serialized output columns, stored by input index so the rows line up
+    # with the input sheet. pending_results holds the results completed since the last checkpoint and is
+    # handed to the callbacks and dropped at every checkpoint, so it stays O(checkpoint_frequency)
+    vuln_funcs: List[Optional[str]] = [None] * len(cve_ids)
+    error_msgs: List[str] = [""] * len(cve_ids)
+    pending_results: List[Dict[str, Any]] = []
+    completed_count = successful_count = failed_count = 0
     
-    # Process CVEs one at a time
-    for i, cve_id in tqdm(enumerate(cve_ids), desc="Processing CVEs"):
-        try:
-            result = await get_vul_funcs(cve_id, prompt)
-            logging.info(f"Successfully processed {cve_id}")
-            processed_results.append({"result": result, "error_msg": ""})
-        except Exception as e:
-            error_msg = str(e)
-            logging.error(f"Error processing {cve_id}: {error_msg}")
-            processed_results.append({"result": "", "error_msg": error_msg})
-        
-        # Execute callbacks at specified frequency
-        if callbacks and (i + 1) % checkpoint_frequency == 0:
-            callback_kwargs = {
-                'excel_path': str(excel_path),
-                'write_to': write_to,
-                'cve_ids': cve_ids
-            }
-            for callback in callbacks:
-                try:
-                    callback(i, processed_results, **callback_kwargs)
-                except Exception as e:
-                    logging.error(f"Callback error: {e}")
+    # Reuse successful results from a previous run's checkpoints; failed CVEs are retried. The checkpoint
+    # stream is shared by every run writing to the same results, so an entry is only reused for the row
+    # at its index if that row still holds the same CVE
+    if resume:
+        for callback in callbacks:
+            if not hasattr(callback, "load"):
+                continue
+            saved = await to_thread.run_sync(callback.load, str(excel_path), write_to)
+            for i, cve_id in enumerate(cve_ids):
+                entry = saved.get((i, cve_id))
+                if entry is not None and entry["error_msg"] == "" and vuln_funcs[i] is None:
+                    vuln_funcs[i] = entry["vuln_funcs"]
+                    successful_count += 1
+        logger.info("Resuming: %d CVEs already processed", successful_count)
     
-    # Execute final callbacks after processing is complete
-    # Handles the case where the last checkpoint is not saved due to the last batch being less than checkpoint_frequency in size
-    if callbacks:
+    # Render the template once and split it around the CVE id, so each prompt is a plain join
+    prompt_parts = prompt.format(cve_id=_CVE_ID_PLACEHOLDER).split(_CVE_ID_PLACEHOLDER)
+    
+    semaphore = anyio.Semaphore(concurrency)
+    request_bucket = TokenBucket.per_minute(rpm) if rpm else None
+    token_bucket = TokenBucket.per_minute(tpm) if tpm else None
+    # Advanced by each worker as its CVE finishes, so progress tracks completions rather than dispatch order
+    progress_bar = tqdm(total=len(cve_ids), initial=successful_count, desc="Processing CVEs", unit="CVE")
+
+    checkpoint_lock = anyio.Lock()
+
+    async def run_callbacks(final: bool = False) -> None:
+        nonlocal pending_results
         callback_kwargs = {
             'excel_path': str(excel_path),
             'write_to': write_to,
             'cve_ids': cve_ids
         }
-        for callback in callbacks:
+        # Callbacks do blocking file I/O, so run them in a worker thread, one checkpoint at a time
+        async with checkpoint_lock:
+            batch, pending_results = pending_results, []
+            current_index = completed_count - 1
+            for callback in callbacks:
+                try:
+                    # The final batch is empty whenever the last checkpoint landed exactly on the last CVE
+                    if batch:
+                        await to_thread.run_sync(functools.partial(callback, current_index, batch, **callback_kwargs))
+                    if final and hasattr(callback, "close"):
+                        await to_thread.run_sync(callback.close)
+                except Exception as e:
+                    logger.error("%s error: %s", "Final callback" if final else "Callback", e)
+
+    async def worker(i: int, cve_id: str) -> None:
+        nonlocal completed_count, successful_count, failed_count
+        async with semaphore:
             try:
-                callback(len(cve_ids) - 1, processed_results, **callback_kwargs)
+                result = await get_vul_funcs(cve_id, cve_id.join(prompt_parts), request_bucket, token_bucket)
+                logger.info("Successfully processed %s", cve_id)
+                error_msg = ""
+                successful_count += 1
             except Exception as e:
-                logging.error(f"Final callback error: {e}")
+                result = ""
+                error_msg = str(e)
+                logger.error("Error processing %s: %s", cve_id, error_msg)
+                failed_count += 1
+
+        # Serialize once; the nested tool-use input is not kept around after this
+        vuln_funcs[i] = orjson.dumps(result).decode()
+        error_msgs[i] = error_msg
+        pending_results.append({"index": i, "cve_id": cve_id, "vuln_funcs": vuln_funcs[i], "error_msg": error_msg})
+        completed_count += 1
+        progress_bar.update(1)
+
+        # Execute callbacks at specified frequency
+        if callbacks and completed_count % checkpoint_frequency == 0:
+            await run_callbacks()
+
+    # Process CVEs concurrently, with at most `concurrency` requests in flight
+    with progress_bar:
+        async with anyio.create_task_group() as tg:
+            for i, cve_id in enumerate(cve_ids):
+                if vuln_funcs[i] is None:
+                    tg.start_soon(worker, i, cve_id)
     
-    successful_count = sum(1 for r in processed_results if r["result"] != "")
-    failed_count = sum(1 for r in processed_results if r["error_msg"] != "")
+    # Execute final callbacks after processing is complete
+    # Handles the case where the last checkpoint is not saved due to the last batch being less than checkpoint_frequency in size
+    if callbacks:
+        await run_callbacks(final=True)
     
-    logging.info(f"Processing complete: {successful_count} successful, {failed_count} failed")
+    logger.info("Processing complete: %d successful, %d failed", successful_count, failed_count)
     
     # You can store or process the results here
     # For example: save to file, database, etc.
-    dataset = dataset.map(lambda _, idx: {"vuln_funcs": json.dumps(processed_results[idx]["result"]), "error_msg": processed_results[idx]["error_msg"]}, with_indices=True)
+    df["vuln_funcs"] = vuln_funcs
+    df["error_msg"] = error_msgs
  
-    logging.info(f"Writing results to sheet: {write_to}")
+    logger.info("Writing results to sheet: %s", write_to)
+    await to_thread.run_sync(_write_excel, df, excel_path, write_to)
     
-    with pd.ExcelWriter(excel_path, mode="a", if_sheet_exists="replace") as writer:
-        dataset.to_pandas().to_excel(writer, sheet_name=write_to, index=False)
+    # Also write a Parquet copy, which is written in one pass, unlike openpyxl's append mode.
+    # read_excel often yields object columns mixing ints and strings, which pyarrow rejects; the
+    # nullable "string" dtype keeps empty cells as nulls. A failed write fails the run, after the
+    # Excel sheet has been saved
+    parquet_path = excel_path.with_name(f"{excel_path.stem}__{write_to}.parquet")
+    logger.info("Writing results to: %s", parquet_path)
+    parquet_df = df.astype({col: "string" for col in df.columns if df[col].dtype == object})
+    await to_thread.run_sync(functools.partial(parquet_df.to_parquet, parquet_path, engine="pyarrow", compression="zstd", index=False))
     
-    return processed_results
+    return df
 
 
 if __name__ == "__main__":
@@ -176,18 +321,47 @@ if __name__ == "__main__":
     parser.add_argument("--read-from", type=str, default="raw", 
                         help="Name of the Excel sheet to read from (default: raw)")
     parser.add_argument("--write-to", type=str, default="wiz-claude_code",
-                        help="Name of the Excel sheet to write results to. WARNING: This will overwrite/create the sheet with this name in the input Excel file")
+                        help="Name of the Excel sheet to write results to, also used for the <input-excel-file stem>__<write-to>.parquet copy next to the input Excel file. WARNING: This will overwrite/create the sheet with this name in the input Excel file")
     parser.add_argument("--prompt-file", type=str, default=str(Path(__file__).parent.parent / "prompt.xml"),
                         help="Path to the prompt XML file (default: ../prompt.xml)")
     parser.add_argument("--checkpoint-frequency", type=int, default=10,
                         help="How often to save checkpoints (every N CVEs, default: 10)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of CVEs processed concurrently (default: 4)")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Client-side limit on Claude requests per minute (default: unlimited)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Client-side limit on estimated prompt tokens per minute (default: unlimited)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip CVEs that were successfully processed in a previous run's checkpoints")
+    
+    parser.add_argument("--log-file", type=str, default=None,
+                        help="Also write the log to this file, e.g. cve_processing.log (default: off)")
     
     args = parser.parse_args()
     
+    # Set up logging
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(log_formatter)
+    logger.addHandler(stream_handler)
+    if args.log_file:
+        file_handler = logging.FileHandler(args.log_file)
+        file_handler.setFormatter(log_formatter)
+        # Buffer file records and only write them out in batches (or as soon as an error is logged)
+        logger.addHandler(logging.handlers.MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=file_handler))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    
     # Load prompt from file
     prompt = Path(args.prompt_file).read_text()
     
     # Set up callbacks
     callbacks = [SaveCheckpointCallback()]
     
-    anyio.run(main, args.input_excel_file, args.read_from, args.write_to, prompt, callbacks, args.checkpoint_frequency)
+    # uvloop cuts per-task scheduling overhead for many concurrent query() streams (not available on Windows)
+    use_uvloop = importlib.util.find_spec("uvloop") is not None
+    
+    anyio.run(main, args.input_excel_file, args.read_from, args.write_to, prompt, callbacks, args.checkpoint_frequency,
+              args.concurrency, args.rpm, args.tpm, args.resume,
+              backend="asyncio", backend_options={"use_uvloop": use_uvloop})
@@ -12,36 +12,63 @@ The main contract:
 
 import re
 import os
+import bisect
 import tempfile
 import shutil
 import fnmatch
+import functools
+import itertools
 import logging
-from typing import List, Dict, Any, Tuple, Optional, Set, Union
-from dataclasses import dataclass
+import operator
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator, Set, FrozenSet, Union
+from collections import OrderedDict
+from dataclasses import dataclass, field
 import difflib
 from pathlib import Path
-from unidiff import PatchSet
-import git
-from git import Repo
-from tqdm import tqdm
+from types import MappingProxyType
 
+import orjson
 
-@dataclass
+try:
+    # C implementation of difflib's matcher (same algorithm and results), if installed
+    from cdifflib import CSequenceMatcher as _SequenceMatcher
+except ImportError:
+    _SequenceMatcher = difflib.SequenceMatcher
+
+try:
+    # Advisory file locks, used to serialize work on the shared repository cache across processes
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@dataclass(frozen=True, slots=True)
 class LanguageConfig:
     """Configuration for language-specific AST parsing."""
     name: str
-    function_node_types: Set[str]
-    class_node_types: Set[str]
+    function_node_types: FrozenSet[str]
+    class_node_types: FrozenSet[str]
     identifier_node_type: str = "identifier"
     qualified_name_separator: str = "."
     
+    def __post_init__(self):
+        # Accept any iterable of node types, but always store an immutable (shareable) frozenset
+        if not isinstance(self.function_node_types, frozenset):
+            object.__setattr__(self, "function_node_types", frozenset(self.function_node_types))
+        if not isinstance(self.class_node_types, frozenset):
+            object.__setattr__(self, "class_node_types", frozenset(self.class_node_types))
+    
     @classmethod
     def python(cls) -> 'LanguageConfig':
         """Configuration for Python."""
         return cls(
             name="python",
-            function_node_types={"function_definition", "async_function_definition"},
-            class_node_types={"class_definition"},
+            function_node_types=frozenset({"function_definition", "async_function_definition"}),
+            class_node_types=frozenset({"class_definition"}),
             identifier_node_type="identifier",
             qualified_name_separator="."
         )
@@ -51,8 +78,8 @@ class LanguageConfig:
         """Configuration for JavaScript/TypeScript."""
         return cls(
             name="javascript",
-            function_node_types={"function_declaration", "function_expression", "arrow_function", "method_definition"},
-            class_node_types={"class_declaration"},
+            function_node_types=frozenset({"function_declaration", "function_expression", "arrow_function", "method_definition"}),
+            class_node_types=frozenset({"class_declaration"}),
             identifier_node_type="identifier",
             qualified_name_separator="."
         )
@@ -62,8 +89,8 @@ class LanguageConfig:
         """Configuration for Java."""
         return cls(
             name="java",
-            function_node_types={"method_declaration", "constructor_declaration"},
-            class_node_types={"class_declaration", "interface_declaration"},
+            function_node_types=frozenset({"method_declaration", "constructor_declaration"}),
+            class_node_types=frozenset({"class_declaration", "interface_declaration"}),
             identifier_node_type="identifier",
             qualified_name_separator="."
         )
@@ -73,8 +100,8 @@ class LanguageConfig:
         """Configuration for C/C++."""
         return cls(
             name="c_and_cpp",
-            function_node_types={"function_definition", "function_declarator"},
-            class_node_types={"class_specifier", "struct_specifier"},
+            function_node_types=frozenset({"function_definition", "function_declarator"}),
+            class_node_types=frozenset({"class_specifier", "struct_specifier"}),
             identifier_node_type="identifier",
             qualified_name_separator="::"
         )
@@ -84,8 +111,8 @@ class LanguageConfig:
         """Configuration for C#."""
         return cls(
             name="csharp",
-            function_node_types={"method_declaration", "constructor_declaration"},
-            class_node_types={"class_declaration", "interface_declaration", "struct_declaration"},
+            function_node_types=frozenset({"method_declaration", "constructor_declaration"}),
+            class_node_types=frozenset({"class_declaration", "interface_declaration", "struct_declaration"}),
             identifier_node_type="identifier",
             qualified_name_separator="."
         )
@@ -95,8 +122,8 @@ class LanguageConfig:
         """Configuration for Rust."""
         return cls(
             name="rust",
-            function_node_types={"function_item"},
-            class_node_types={"struct_item", "enum_item", "impl_item"},
+            function_node_types=frozenset({"function_item"}),
+            class_node_types=frozenset({"struct_item", "enum_item", "impl_item"}),
             identifier_node_type="identifier",
             qualified_name_separator="::"
         )
@@ -106,14 +133,96 @@ class LanguageConfig:
         """Configuration for Go."""
         return cls(
             name="go",
-            function_node_types={"function_declaration", "method_declaration"},
-            class_node_types={"type_declaration"},  # Go doesn't have classes, but has types
+            function_node_types=frozenset({"function_declaration", "method_declaration"}),
+            class_node_types=frozenset({"type_declaration"}),  # Go doesn't have classes, but has types
             identifier_node_type="identifier",
             qualified_name_separator="."
         )
 
 
-@dataclass
+# Shared, immutable configs built once at import time
+PYTHON_CONFIG = LanguageConfig.python()
+JAVASCRIPT_CONFIG = LanguageConfig.javascript()
+JAVA_CONFIG = LanguageConfig.java()
+C_CPP_CONFIG = LanguageConfig.c_cpp()
+CSHARP_CONFIG = LanguageConfig.csharp()
+RUST_CONFIG = LanguageConfig.rust()
+GO_CONFIG = LanguageConfig.go()
+
+# Map parser language names to their config
+_LANG_CONFIGS: Dict[str, LanguageConfig] = {
+    'python': PYTHON_CONFIG,
+    'javascript': JAVASCRIPT_CONFIG,
+    'typescript': JAVASCRIPT_CONFIG,  # TypeScript uses JS config
+    'java': JAVA_CONFIG,
+    'c': C_CPP_CONFIG,
+    'cpp': C_CPP_CONFIG,
+    'c_sharp': CSHARP_CONFIG,
+    'rust': RUST_CONFIG,
+    'go': GO_CONFIG,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class LanguageRuntime:
+    """Grammar-specific node kind IDs and function/class query for a loaded parser."""
+    config: LanguageConfig
+    function_kind_ids: FrozenSet[int]
+    class_kind_ids: FrozenSet[int]
+    query: Any = None  # tree_sitter.Query capturing @function and @class nodes
+
+    @classmethod
+    def build(cls, ts_language, config: LanguageConfig) -> 'LanguageRuntime':
+        """
+        Resolve the config's node type names to kind IDs of the given tree-sitter Language.
+
+        Every kind ID is scanned (rather than looking each name up once) so that aliased
+        symbols sharing a name are matched as well.
+        """
+        function_kind_ids = set()
+        class_kind_ids = set()
+        function_kinds = set()
+        class_kinds = set()
+        for kind_id in range(ts_language.node_kind_count):
+            if not ts_language.node_kind_is_named(kind_id):
+                continue
+            kind = ts_language.node_kind_for_id(kind_id)
+            if kind in config.function_node_types:
+                function_kind_ids.add(kind_id)
+                function_kinds.add(kind)
+            if kind in config.class_node_types:
+                class_kind_ids.add(kind_id)
+                class_kinds.add(kind)
+        
+        # Only node types that exist in this grammar may appear in the query
+        patterns = [f"({kind}) @function" for kind in sorted(function_kinds)]
+        patterns += [f"({kind}) @class" for kind in sorted(class_kinds)]
+        try:
+            query = ts_language.query("\n".join(patterns)) if function_kinds else None
+        except Exception:
+            query = None
+        
+        return cls(
+            config=config,
+            function_kind_ids=frozenset(function_kind_ids),
+            class_kind_ids=frozenset(class_kind_ids),
+            query=query
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _language_runtime(language: str) -> LanguageRuntime:
+    """
+    Build the LanguageRuntime for a parser language once per process.
+    
+    Scanning node kinds and compiling the query costs milliseconds, so every generator
+    instance (and thread) shares the result. Raises KeyError for languages without a config.
+    """
+    from tree_sitter_languages import get_language
+    return LanguageRuntime.build(get_language(language), _LANG_CONFIGS[language])
+
+
+@dataclass(frozen=True, slots=True)
 class FunctionSpan:
     """Represents a function's location and metadata in source code."""
     name: str
@@ -123,22 +232,238 @@ class FunctionSpan:
     end_line: int
     class_name: Optional[str] = None
     qualified_name_separator: str = "."
+    # Qualified function name (ClassName.methodName or functionName), built once
+    qualified_name: str = field(init=False, repr=False, compare=False)
     
-    @property
-    def qualified_name(self) -> str:
-        """Return the qualified function name (ClassName.methodName or functionName)."""
+    def __post_init__(self):
         if self.class_name:
-            return f"{self.class_name}{self.qualified_name_separator}{self.name}"
-        return self.name
+            qualified_name = f"{self.class_name}{self.qualified_name_separator}{self.name}"
+        else:
+            qualified_name = self.name
+        object.__setattr__(self, "qualified_name", qualified_name)
+    
+    def to_tuple(self) -> tuple:
+        """Return the constructor arguments as a plain tuple; FunctionSpan(*span.to_tuple()) rebuilds the span."""
+        return (self.name, self.start_byte, self.end_byte, self.start_line, self.end_line,
+                self.class_name, self.qualified_name_separator)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DiffRanges:
     """Represents line ranges changed in a diff, separated by source and target files."""
     source_ranges: List[Tuple[int, int]]
     target_ranges: List[Tuple[int, int]]
 
 
+# Map extensions to language names and their tree-sitter parser names
+_EXT_TO_LANG = MappingProxyType({
+    # Python
+    '.py': 'python',
+    '.pyi': 'python', 
+    '.pyx': 'python',
+    '.pxi': 'python',
+
+    # JavaScript/TypeScript
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',  # Use typescript parser for .ts files
+    '.tsx': 'typescript',
+    '.mjs': 'javascript',
+
+    # Java
+    '.java': 'java',
+
+    # C/C++
+    '.c': 'c',
+    '.cpp': 'cpp',
+    '.cc': 'cpp',
+    '.cxx': 'cpp',
+    '.c++': 'cpp',
+    '.h': 'c',  # Headers could be either, default to C
+    '.hpp': 'cpp',
+    '.hxx': 'cpp',
+    '.h++': 'cpp',
+
+    # C#
+    '.cs': 'c_sharp',
+
+    # Rust
+    '.rs': 'rust',
+
+    # Go
+    '.go': 'go',
+})
+
+
+# Length of the longest known extension, including the dot
+_MAX_EXT_LEN = max(map(len, _EXT_TO_LANG))
+
+# Extensions (lowercase) of the files considered source code by _is_code_file
+_CODE_EXTENSIONS = frozenset({
+    '.py', '.pxi', '.pyi', '.js', '.ts', '.jsx', '.tsx', '.java', '.c', '.cpp', '.cc', '.cxx',
+    '.h', '.hpp', '.hxx', '.cs', '.rs', '.go', '.php', '.rb', '.swift',
+    '.kt', '.scala', '.sh', '.bash', '.zsh', '.fish', '.ps1', '.m', '.mm',
+    '.r', '.jl', '.hs', '.elm', '.clj', '.cljs', '.fs', '.fsx', '.ml', '.mli'
+})
+_MAX_CODE_EXT_LEN = max(map(len, _CODE_EXTENSIONS))
+
+
+def _lower_extension(file_path: str, max_len: int) -> Optional[str]:
+    """
+    Get the lowercased extension of a path, as os.path.splitext would find it, or None if it has
+    none or it is longer than max_len.
+    
+    Only the (short) suffix of the basename is lowercased, and leading dots of the basename do
+    not start an extension.
+    """
+    dot = file_path.rfind('.')
+    # Most paths are rejected here: no dot, or a suffix longer than any wanted extension
+    if dot < 0 or len(file_path) - dot > max_len:
+        return None
+    
+    stem_start = file_path.rfind('/') + 1
+    if dot <= stem_start or not file_path[stem_start:dot].strip('.'):
+        return None
+    
+    return file_path[dot:].lower()
+
+# Host URL mappings for different Git hosting providers
+_HOST_URLS = MappingProxyType({
+    "github": "https://github.com",
+    "gitlab": "https://gitlab.com"
+})
+
+class _LineIndex:
+    """
+    Maps byte offsets of a source to 1-based line numbers.
+    
+    Newlines are counted (with bytes.count, in C) only between the previously requested
+    offset and the next one, so walking the functions of a file in source order scans
+    it once, without building a per-line offset table in Python.
+    """
+    __slots__ = ("source", "offset", "line")
+    
+    def __init__(self, source: bytes):
+        self.source = source
+        self.offset = 0
+        self.line = 1
+    
+    def line_at(self, byte: int) -> int:
+        """Return the line number containing the given byte offset."""
+        if byte >= self.offset:
+            self.line += self.source.count(b'\n', self.offset, byte)
+        else:
+            self.line -= self.source.count(b'\n', byte, self.offset)
+        self.offset = byte
+        return self.line
+
+
+class _SpanReuse:
+    """
+    Carries pre-patch function spans over to the incrementally re-parsed post-patch tree.
+    
+    A post-patch function that no edit touched, and in which tree-sitter reports no structural
+    change, is a pre-patch function moved by the edits before it: its span is shifted rather
+    than re-reading its name from the tree and counting its lines again.
+    """
+    __slots__ = ("pre_spans", "affected_starts", "affected_ends", "edit_ends", "byte_deltas", "line_deltas")
+    
+    def __init__(self, pre_functions: List['FunctionSpan'], edits: List[tuple], changed_ranges):
+        """
+        Args:
+            pre_functions: Spans extracted from the tree before it was edited
+            edits: Edits applied to that tree, in source order (see _edit_tree_for_hunks)
+            changed_ranges: Tree.changed_ranges between the edited and the re-parsed tree
+        """
+        self.pre_spans = {(func.start_byte, func.end_byte): func for func in pre_functions}
+        
+        # Edited and structurally changed byte ranges, in post-patch offsets
+        affected = [(changed.start_byte, changed.end_byte) for changed in changed_ranges]
+        self.edit_ends = []  # Post-patch end offset of each edit
+        self.byte_deltas = [0]  # Offset and line shifts after the first k edits
+        self.line_deltas = [0]
+        for start_byte, old_end_byte, new_end_byte, _, old_end_point, new_end_point in edits:
+            shift = self.byte_deltas[-1]
+            affected.append((start_byte + shift, new_end_byte + shift))
+            self.edit_ends.append(new_end_byte + shift)
+            self.byte_deltas.append(shift + new_end_byte - old_end_byte)
+            self.line_deltas.append(self.line_deltas[-1] + new_end_point[0] - old_end_point[0])
+        
+        affected.sort()
+        self.affected_starts = [start for start, _ in affected]
+        # Running maximum, so one bisection tells whether any range reaches a given offset
+        self.affected_ends = list(itertools.accumulate((end for _, end in affected), max))
+    
+    def span_at(self, start_byte: int, end_byte: int, class_name: Optional[str]) -> Optional['FunctionSpan']:
+        """Return the shifted pre-patch span of the function at these post-patch offsets, if reusable."""
+        # Ranges touching the function (even at its boundaries) rule out reuse
+        candidates = bisect.bisect_right(self.affected_starts, end_byte)
+        if candidates and self.affected_ends[candidates - 1] >= start_byte:
+            return None
+        
+        edits_before = bisect.bisect_left(self.edit_ends, start_byte)
+        byte_delta = self.byte_deltas[edits_before]
+        pre_span = self.pre_spans.get((start_byte - byte_delta, end_byte - byte_delta))
+        if pre_span is None or pre_span.class_name != class_name:
+            return None
+        
+        line_delta = self.line_deltas[edits_before]
+        if not byte_delta and not line_delta:
+            return pre_span
+        return FunctionSpan(
+            name=pre_span.name,
+            start_byte=start_byte,
+            end_byte=end_byte,
+            start_line=pre_span.start_line + line_delta,
+            end_line=pre_span.end_line + line_delta,
+            class_name=class_name,
+            qualified_name_separator=pre_span.qualified_name_separator
+        )
+
+
+def _read_nul_fields(stream) -> Iterator[bytes]:
+    """Yield the NUL-terminated fields of a binary stream (e.g. git -z output) as they are read."""
+    buffer = b""
+    for chunk in iter(lambda: stream.read1(65536), b""):
+        *fields, buffer = (buffer + chunk).split(b"\0")
+        yield from fields
+    if buffer:
+        yield buffer
+
+
+# Characters that make a glob pattern more than a plain string
+_GLOB_MAGIC = re.compile(r'[*?\[]')
+
+
+@dataclass(frozen=True, slots=True)
+class _IgnoreMatchers:
+    """Compiled ignore patterns of one language, see FuncLevelDiffGenerator._get_ignore_matchers."""
+    dir_matcher: re.Pattern
+    dir_prefix_matcher: Optional[re.Pattern]  # Patterns to check against every parent directory
+    file_literals: FrozenSet[str]
+    file_extensions: FrozenSet[str]  # "*.md" -> ".md"
+    file_prefixes: Tuple[str, ...]
+    file_suffixes: Tuple[str, ...]  # "*.min.js" -> ".min.js"
+    file_matcher: Optional[re.Pattern]  # Remaining file patterns
+
+# Lines of a git patch's extended header, before the hunks of a file (or "Binary files ... differ")
+_PATCH_HEADER_PREFIXES = (
+    b"old mode ", b"new mode ", b"deleted file mode ", b"new file mode ", b"similarity index ",
+    b"dissimilarity index ", b"rename from ", b"rename to ", b"copy from ", b"copy to ",
+    b"index ", b"--- ", b"+++ "
+)
+
+# Status of a file in "git log/diff --name-status" output (e.g. "M", "R100")
+_NAME_STATUS_RE = re.compile(rb'[ACDMRTUXB]\d*\Z')
+
+# Unified diff hunk header: source start, source length, target start, target length
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@', re.M)
+
+# Unified diff file headers (the path runs up to an optional tab-separated timestamp)
+_SOURCE_FILE_RE = re.compile(r'^--- ([^\t\n]+)', re.M)
+_TARGET_FILE_RE = re.compile(r'^\+\+\+ ([^\t\n]+)', re.M)
+
+
 class FuncLevelDiffGenerator:
     """
     Multi-language generator for per-function unified diffs with full context from Git repositories.
@@ -207,15 +532,15 @@ class FuncLevelDiffGenerator:
         >>> # Cache repositories for faster repeated access
         >>> cache_dir = Path("./repo_cache")
         >>> with FuncLevelDiffGenerator.create("owner/repo", repo_cache=cache_dir) as gen:
-        ...     result = gen("abc123456")  # First time: clones to cache/github--owner--repo
+        ...     result = gen("abc123456")  # First time: clones to cache/github--owner--repo.git
         ...     
         >>> # Subsequent uses reuse cached repository with latest changes
         >>> with FuncLevelDiffGenerator.create("owner/repo", repo_cache=cache_dir) as gen:
-        ...     result = gen("def789012")  # Pulls latest, then analyzes
+        ...     result = gen("def789012")  # Fetches latest, then analyzes
         
         >>> # GitLab repositories are cached separately
         >>> with FuncLevelDiffGenerator.create("owner/repo", repo_cache=cache_dir, host="gitlab") as gen:
-        ...     result = gen("abc123456")  # Clones to cache/gitlab--owner--repo
+        ...     result = gen("abc123456")  # Clones to cache/gitlab--owner--repo.git
     
     Commit Analysis:
         >>> generator = FuncLevelDiffGenerator.create("owner/repo")
@@ -286,29 +611,59 @@ class FuncLevelDiffGenerator:
     
     Error Handling:
         - Missing parsers: Language is skipped with a warning
-        - Binary files: Skipped automatically  
+        - Binary files: Skipped automatically, as are files larger than MAX_BLOB_SIZE
         - Encoding issues: Individual files skipped with warning
         - Invalid commits: Raises git.exc.GitError
         - No changes found: Raises ValueError("No function diffs found")
     
     Notes:
-        - Repository is cloned once during initialization for efficiency
-        - Uses GitPython for robust Git operations
+        - Repository is cloned once during initialization for efficiency, as a blobless partial
+          clone (--filter=blob:none): file contents are fetched on demand for the commits analyzed
+        - Uses GitPython for robust Git operations; file contents are read in-process through
+          pygit2 (libgit2) when it is installed, falling back to GitPython otherwise
         - Repository caching: When repo_cache is provided, repositories are stored persistently
-          and reused across sessions with automatic updates from remote main/master
+          as bare mirrors and reused across sessions with automatic updates from the remote;
+          each generator works in its own detached worktree, so parallel jobs do not contend
+          on a single working tree
         - Temporary directories are automatically cleaned up; cached repositories are preserved
         - Function names are qualified (ClassName.methodName for methods)
         - Language-specific naming conventions are respected (:: for C++/Rust, . for others)
         - Processes all supported code files changed in the commit automatically
-        - Parsers are cached per instance to avoid reloading
+        - Parsers are pooled per thread and shared across generator instances to avoid reloading
+        - With ast_cache set, function spans are cached on disk by blob SHA, so files already
+          parsed in earlier runs are not parsed again
+        - Changed files are parsed and diffed on max_workers threads; results keep file order
         - Thread-safe for read operations after initialization
     """
     
-    # Host URL mappings for different Git hosting providers
-    HOST_URLS = {
-        "github": "https://github.com",
-        "gitlab": "https://gitlab.com"
-    }
+    # Host URL mappings for different Git hosting providers (read-only)
+    HOST_URLS = _HOST_URLS
+    
+    # Blobless partial clone: full history and trees, but file contents are only fetched
+    # (lazily, by git itself) for the files that are actually analyzed. Files are read from
+    # git objects, never from the working tree, so nothing is checked out
+    CLONE_OPTIONS = ["--filter=blob:none", "--no-checkout"]
+    
+    # Blobs larger than this (generated code, vendored bundles, LFS payloads) are not parsed
+    MAX_BLOB_SIZE = 2 * 1024 * 1024
+    # Leading bytes searched for a NUL byte to detect binary blobs, as git itself does
+    BINARY_SNIFF_SIZE = 8000
+    # Total size of the file contents kept in memory, keyed by (commit SHA, path)
+    BLOB_CACHE_BYTES = 64 * 1024 * 1024
+    # Commits whose changed files and diffs are kept in memory, keyed by the requested commit
+    COMMIT_CACHE_SIZE = 256
+    
+    # Tree-sitter parsers are not thread-safe, so each thread keeps its own, shared by all
+    # generators used on that thread (.parsers: language_name -> parser)
+    _parser_pool = threading.local()
+    
+    # Serializes adding the shared worktrees of cached mirrors within a process; a file lock next
+    # to each worktree serializes it across processes (see shared_worktree)
+    _shared_worktree_lock = threading.Lock()
+    
+    # Bump when the extracted spans change for the same source (configs, FunctionSpan fields) or
+    # when their serialization changes
+    AST_CACHE_VERSION = 4
     
     # Gitignore-style patterns for files/directories we typically don't consider as "interesting code"
     ignore_patterns = {
@@ -860,7 +1215,8 @@ class FuncLevelDiffGenerator:
         }
     }
     
-    def __init__(self, repo_slug: str, silent: bool = False, repo_cache: Optional[Union[str, Path]] = None, host: str = "github"):
+    def __init__(self, repo_slug: str, silent: bool = False, repo_cache: Optional[Union[str, Path]] = None, host: str = "github",
+                 max_workers: Optional[int] = 1, ast_cache: Optional[Union[str, Path]] = None):
         """
         Initialize the generator for multi-language repository analysis.
         
@@ -874,15 +1230,24 @@ class FuncLevelDiffGenerator:
             repo_cache: Optional directory path to cache repositories persistently.
                        If provided, repos will be cached here instead of using temp dirs.
             host: Git hosting provider ('github' or 'gitlab'). Defaults to 'github'.
+            max_workers: Number of threads used to parse and diff the changed files of a commit.
+                        Defaults to 1 (serial processing); None uses one thread per CPU.
+            ast_cache: Optional SQLite database file in which extracted function spans are cached
+                      by blob SHA and language, so files seen in earlier runs are not re-parsed.
         """
+        from git import Repo
+        
         self.repo_path = None
         self.repo = None
+        self.pg_repo = None
         self.repo_slug = repo_slug
         self.host = host
         self.logger = logging.getLogger(__name__)
         self.silent = silent
+        self.max_workers = max(1, max_workers if max_workers is not None else (os.cpu_count() or 1))
         self.repo_cache = Path(repo_cache).expanduser() if repo_cache else None
         self.cleanup_repo = False  # Track whether to clean up on exit
+        self.cached_repo_path = None  # Bare mirror in repo_cache backing this instance's worktree
         
         # Validate host
         if host not in self.HOST_URLS:
@@ -891,14 +1256,34 @@ class FuncLevelDiffGenerator:
         # Dynamic parser and config storage
         self.parsers = {}  # language_name -> parser
         self.language_configs = {}  # language_name -> LanguageConfig
+        self.language_runtimes = {}  # language_name -> LanguageRuntime
+
+        # Worker pool kept across commits so its threads' parsers stay warm
+        self._executor = None
+        
+        # Recently read file contents: (commit SHA, path) -> (contents, blob SHA), least recent first
+        self._blob_cache: "OrderedDict[Tuple[str, str], Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._blob_cache_bytes = 0
+        
+        # Recent get_changed_files / get_changed_files_with_diffs / get_file_diff_from_commit results
+        self._changed_files_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._file_changes_cache: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+        self._file_diffs_cache: "OrderedDict[Tuple[str, Optional[Tuple[str, ...]]], Dict[str, str]]" = OrderedDict()
+        self._file_diff_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        
+        # Persistent function span cache, shared by the worker threads
+        self._ast_cache_lock = threading.Lock()
+        self.ast_cache = self._open_ast_cache(ast_cache) if ast_cache else None
         
         # Clone repository using GitPython
         self.repo_path = self.clone_repository(repo_slug, host)
         self.logger.info(f"Repository available at {self.repo_path}")
         self.repo = Repo(self.repo_path)
+        self.pg_repo = self._open_pygit2_repo(self.repo_path)
     
     @classmethod 
-    def create(cls, repo_slug: str, silent: bool = False, repo_cache: Optional[Union[str, Path]] = None, host: str = "github"):
+    def create(cls, repo_slug: str, silent: bool = False, repo_cache: Optional[Union[str, Path]] = None, host: str = "github",
+               max_workers: Optional[int] = 1, ast_cache: Optional[Union[str, Path]] = None):
         """
         Create a multi-language diff generator.
         
@@ -907,66 +1292,34 @@ class FuncLevelDiffGenerator:
             silent: Whether to suppress progress bars
             repo_cache: Optional directory path to cache repositories persistently
             host: Git hosting provider ('github' or 'gitlab'). Defaults to 'github'.
+            max_workers: Number of threads used to process the changed files of a commit
+                        (None: one per CPU)
+            ast_cache: Optional SQLite database file for caching function spans across runs
             
         Returns:
             FuncLevelDiffGenerator that can handle multiple languages
         """
-        return cls(repo_slug, silent, repo_cache, host)
+        return cls(repo_slug, silent, repo_cache, host, max_workers, ast_cache)
 
-    def _detect_file_language(self, file_path: str) -> Optional[str]:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _detect_file_language(file_path: str) -> Optional[str]:
         """
         Detect the programming language of a file based on its extension.
         
+        Memoized: each changed file is looked up both when filtering and when extracting its diffs.
+        
         Args:
             file_path: Path to the file
             
         Returns:
             Language name if detected, None if unknown
         """
-        _, ext = os.path.splitext(file_path.lower())
-        
-        # Map extensions to language names and their tree-sitter parser names
-        extension_to_language = {
-            # Python
-            '.py': 'python',
-            '.pyi': 'python', 
-            '.pyx': 'python',
-            '.pxi': 'python',
-            
-            # JavaScript/TypeScript
-            '.js': 'javascript',
-            '.jsx': 'javascript',
-            '.ts': 'typescript',  # Use typescript parser for .ts files
-            '.tsx': 'typescript',
-            '.mjs': 'javascript',
-            
-            # Java
-            '.java': 'java',
-            
-            # C/C++
-            '.c': 'c',
-            '.cpp': 'cpp',
-            '.cc': 'cpp',
-            '.cxx': 'cpp',
-            '.c++': 'cpp',
-            '.h': 'c',  # Headers could be either, default to C
-            '.hpp': 'cpp',
-            '.hxx': 'cpp',
-            '.h++': 'cpp',
-            
-            # C#
-            '.cs': 'c_sharp',
-            
-            # Rust
-            '.rs': 'rust',
-            
-            # Go
-            '.go': 'go',
-        }
-        
-        return extension_to_language.get(ext)
+        ext = _lower_extension(file_path, _MAX_EXT_LEN)
+        return _EXT_TO_LANG.get(ext) if ext is not None else None
 
-    def _get_language_config(self, language: str) -> LanguageConfig:
+    @staticmethod
+    def _get_language_config(language: str) -> Optional[LanguageConfig]:
         """
         Get the language configuration for a given language.
         
@@ -974,37 +1327,9 @@ class FuncLevelDiffGenerator:
             language: Language name (e.g., 'python', 'javascript')
             
         Returns:
-            LanguageConfig for the language
-        """
-        # Map parser language names to our config names
-        language_mapping = {
-            'python': 'python',
-            'javascript': 'javascript', 
-            'typescript': 'javascript',  # TypeScript uses JS config
-            'java': 'java',
-            'c': 'c_and_cpp',
-            'cpp': 'c_and_cpp', 
-            'c_sharp': 'csharp',
-            'rust': 'rust',
-            'go': 'go'
-        }
-        
-        config_name = language_mapping.get(language)
-        if config_name is None:
-            return None
-            
-        # Get config from our predefined configs
-        config_methods = {
-            'python': LanguageConfig.python,
-            'javascript': LanguageConfig.javascript,
-            'java': LanguageConfig.java,
-            'c_and_cpp': LanguageConfig.c_cpp,
-            'csharp': LanguageConfig.csharp,
-            'rust': LanguageConfig.rust,
-            'go': LanguageConfig.go
-        }
-        
-        return config_methods[config_name]()
+            Shared LanguageConfig for the language, None if unsupported
+        """
+        return _LANG_CONFIGS.get(language)
 
     def _detect_languages_in_files(self, file_paths: List[str]) -> Set[str]:
         """
@@ -1035,7 +1360,10 @@ class FuncLevelDiffGenerator:
             
         try:
             from tree_sitter_languages import get_parser
-            parser = get_parser(language)
+            thread_parsers = self._thread_parsers()
+            parser = thread_parsers.get(language)
+            if parser is None:
+                parser = thread_parsers[language] = get_parser(language)
             self.parsers[language] = parser
             
             # Also store the language config
@@ -1043,94 +1371,323 @@ class FuncLevelDiffGenerator:
             if config:
                 self.language_configs[language] = config
                 
+                # Node kind IDs let the AST walk compare ints instead of type strings
+                try:
+                    self.language_runtimes[language] = _language_runtime(language)
+                except AttributeError:
+                    # Older py-tree-sitter without node kind introspection: fall back to type names
+                    pass
+                
             self.logger.info(f"Loaded parser for {language}")
             
         except Exception as e:
             self.logger.warning(f"Could not load parser for {language}: {e}")
 
-    def _load_parsers_for_commit(self, commit_hash: str):
+    @classmethod
+    def _thread_parsers(cls) -> Dict[str, Any]:
+        """Get the calling thread's parser pool (language_name -> parser)."""
+        parsers = getattr(cls._parser_pool, "parsers", None)
+        if parsers is None:
+            parsers = cls._parser_pool.parsers = {}
+        return parsers
+
+    def _get_thread_parser(self, language: str):
         """
-        Load all necessary parsers for files changed in the given commit.
+        Get the calling thread's parser for a loaded language.
+        
+        Parsers come from the calling thread's pool, which is shared across generator
+        instances; a thread builds its parser for a language on first use.
         
         Args:
-            commit_hash: The commit to analyze for language requirements
-        """
-        try:
-            # Get all changed files in the commit
-            changed_files = self.get_changed_files(commit_hash)
-            
-            # Detect languages in these files
-            languages = self._detect_languages_in_files(changed_files)
+            language: Language name (e.g., 'python', 'javascript')
             
-            # Load parsers for each detected language
-            for language in languages:
-                self._load_parser(language)
-                
-        except Exception as e:
-            self.logger.warning(f"Error loading parsers for commit {commit_hash}: {e}")
+        Returns:
+            Tree-sitter parser, or None if no parser is available for the language
+        """
+        if language not in self.parsers:
+            return None
+        
+        parsers = self._thread_parsers()
+        parser = parsers.get(language)
+        if parser is None:
+            from tree_sitter_languages import get_parser
+            parser = parsers[language] = get_parser(language)
+        return parser
 
-    def extract_functions_from_ast(self, text: str, parser, language_config: LanguageConfig) -> List[FunctionSpan]:
+    def extract_functions_from_ast(self, text: Union[str, bytes], parser, language_config: LanguageConfig,
+                                   language_runtime: Optional[LanguageRuntime] = None) -> List[FunctionSpan]:
         """
         Extract function and method spans from source code using tree-sitter.
         
         Now takes parser and config as parameters to support multiple languages.
         
         Args:
-            text: Source code text to parse
+            text: Source code to parse, as text or as UTF-8 bytes (span offsets are byte offsets)
             parser: Tree-sitter parser instance for the appropriate language
             language_config: Language configuration for AST parsing
+            language_runtime: Optional grammar-specific data for the parser; when given, function
+                              and class nodes are found with its tree-sitter query, or matched by
+                              integer kind_id if no query could be built
             
         Returns:
             List[FunctionSpan]: List of FunctionSpan objects representing all
                                functions and methods found in the code
         """
-        tree = parser.parse(bytes(text, 'utf8'))
+        source = text.encode('utf-8') if isinstance(text, str) else text
+        tree = parser.parse(source)
+        return self._extract_functions_from_tree(tree, source, language_config, language_runtime)
+
+    def _extract_functions_from_tree(self, tree, source: bytes, language_config: LanguageConfig,
+                                     language_runtime: Optional[LanguageRuntime] = None,
+                                     span_reuse: Optional['_SpanReuse'] = None) -> List[FunctionSpan]:
+        """
+        Extract function and method spans from an already parsed tree (see extract_functions_from_ast).
+        
+        span_reuse, for a tree re-parsed incrementally from a tree whose spans are known, lets
+        the query path carry unchanged functions over instead of re-reading them.
+        """
+        line_index = _LineIndex(source)
+        
+        if language_runtime is not None and language_runtime.query is not None:
+            return self._extract_functions_with_query(tree, source, line_index, language_config, language_runtime.query,
+                                                      span_reuse)
+        
         functions = []
         
-        def extract_from_node(node, class_name: Optional[str] = None):
-            """Recursively extract functions from AST nodes."""
+        if language_runtime is not None:
+            function_kinds = language_runtime.function_kind_ids
+            class_kinds = language_runtime.class_kind_ids
+            kind_of = operator.attrgetter('kind_id')
+        else:
+            function_kinds = language_config.function_node_types
+            class_kinds = language_config.class_node_types
+            kind_of = operator.attrgetter('type')
+        
+        # Iterative pre-order walk; children are pushed in reverse so they pop in source order
+        stack = [(tree.root_node, None)]
+        while stack:
+            node, class_name = stack.pop()
+            kind = kind_of(node)
+            
             # Check if this node is a function definition
-            if node.type in language_config.function_node_types:
-                func_name = self._find_identifier_in_node(node, text, language_config)
+            if kind in function_kinds:
+                func_name = self._find_identifier_in_node(node, source, language_config)
                 
                 if func_name:
-                    # Convert byte offsets to line numbers
-                    start_line = text[:node.start_byte].count('\n') + 1
-                    end_line = text[:node.end_byte].count('\n') + 1
-                    
-                    functions.append(FunctionSpan(
-                        name=func_name,
-                        start_byte=node.start_byte,
-                        end_byte=node.end_byte,
-                        start_line=start_line,
-                        end_line=end_line,
-                        class_name=class_name,
-                        qualified_name_separator=language_config.qualified_name_separator
-                    ))
-            
-            # Check if this node is a class definition
-            elif node.type in language_config.class_node_types:
-                class_name_for_methods = self._find_identifier_in_node(node, text, language_config)
-                
-                # Recursively process class body for methods
-                for child in node.children:
-                    extract_from_node(child, class_name_for_methods)
+                    functions.append(self._make_function_span(node, func_name, line_index, class_name, language_config))
+            
+            # Check if this node is a class definition; its body is walked for methods
+            elif kind in class_kinds:
+                class_name_for_methods = self._find_identifier_in_node(node, source, language_config)
+                stack.extend((child, class_name_for_methods) for child in reversed(node.children))
             
-            # Recursively process child nodes
+            # Process child nodes
             else:
-                for child in node.children:
-                    extract_from_node(child, class_name)
+                stack.extend((child, class_name) for child in reversed(node.children))
         
-        extract_from_node(tree.root_node)
         return functions
 
-    def _find_identifier_in_node(self, node, text: str, language_config: LanguageConfig) -> Optional[str]:
+    def _extract_functions_with_query(self, tree, source: bytes, line_index: '_LineIndex', language_config: LanguageConfig,
+                                      query, span_reuse: Optional['_SpanReuse'] = None) -> List[FunctionSpan]:
+        """
+        Extract function spans from the captures of a language's function/class query.
+        
+        Gives the same result as the recursive walk in extract_functions_from_ast: functions
+        nested inside other functions are skipped, and methods are qualified with the name of
+        their innermost enclosing class.
+        
+        Args:
+            tree: Parsed tree-sitter tree of source
+            source: UTF-8 encoded source code
+            line_index: Byte offset to line number mapping for source
+            language_config: Language configuration for AST parsing
+            query: Query capturing function nodes as @function and class nodes as @class
+            span_reuse: Optional pre-patch spans to reuse for functions no edit touched
+            
+        Returns:
+            List[FunctionSpan]: Function spans in source order
+        """
+        # Read each node's byte range once (every attribute access crosses into C), then
+        # order outer nodes first when several captures start at the same byte (the capture
+        # index keeps ties in query order and stops the sort from comparing nodes)
+        captures = sorted(
+            (node.start_byte, -node.end_byte, index, capture_name, node)
+            for index, (node, capture_name) in enumerate(query.captures(tree.root_node))
+        )
+        
+        functions = []
+        enclosing = []  # (end_byte, is_function, class_name) for captured ancestors of the current node
+        for start_byte, neg_end_byte, _, capture_name, node in captures:
+            while enclosing and start_byte >= enclosing[-1][0]:
+                enclosing.pop()
+            
+            if enclosing and enclosing[-1][1]:
+                continue  # Inside a function: nested definitions are not extracted
+            
+            class_name = enclosing[-1][2] if enclosing else None
+            if capture_name == "function":
+                span = span_reuse.span_at(start_byte, -neg_end_byte, class_name) if span_reuse is not None else None
+                if span is None:
+                    func_name = self._find_identifier_in_node(node, source, language_config)
+                    if func_name:
+                        span = self._make_function_span(node, func_name, line_index, class_name, language_config)
+                if span is not None:
+                    functions.append(span)
+                enclosing.append((-neg_end_byte, True, None))
+            else:
+                class_name_for_methods = self._find_identifier_in_node(node, source, language_config)
+                enclosing.append((-neg_end_byte, False, class_name_for_methods))
+        
+        return functions
+
+    @staticmethod
+    def _edit_tree_for_new_source(tree, old_source: bytes, new_source: bytes) -> List[tuple]:
+        """
+        Record the change from old_source to new_source on tree, so it can be passed to
+        parser.parse(new_source, tree) for an incremental re-parse.
+        
+        The edit is the single byte range between the common prefix and common suffix of the two
+        sources. The tree's node positions are updated in place, so spans must be extracted from
+        it before calling this.
+        
+        Returns:
+            The applied edit, as a one-element list of (start_byte, old_end_byte, new_end_byte,
+            start_point, old_end_point, new_end_point)
+        """
+        max_common = min(len(old_source), len(new_source))
+        
+        # Binary search over slice comparisons keeps the byte comparisons in C
+        low, high = 0, max_common
+        while low < high:
+            mid = (low + high + 1) // 2
+            if old_source[:mid] == new_source[:mid]:
+                low = mid
+            else:
+                high = mid - 1
+        prefix = low
+        
+        low, high = 0, max_common - prefix
+        while low < high:
+            mid = (low + high + 1) // 2
+            if old_source[len(old_source) - mid:] == new_source[len(new_source) - mid:]:
+                low = mid
+            else:
+                high = mid - 1
+        suffix = low
+        
+        def point(source: bytes, byte: int) -> Tuple[int, int]:
+            return source.count(b'\n', 0, byte), byte - (source.rfind(b'\n', 0, byte) + 1)
+        
+        old_end = len(old_source) - suffix
+        new_end = len(new_source) - suffix
+        edit = (prefix, old_end, new_end, point(old_source, prefix), point(old_source, old_end), point(new_source, new_end))
+        tree.edit(
+            start_byte=edit[0],
+            old_end_byte=edit[1],
+            new_end_byte=edit[2],
+            start_point=edit[3],
+            old_end_point=edit[4],
+            new_end_point=edit[5]
+        )
+        return [edit]
+
+    @staticmethod
+    def _edit_tree_for_hunks(tree, old_source: bytes, new_source: bytes, unified_diff: str) -> Optional[List[tuple]]:
+        """
+        Record the hunks of unified_diff as separate edits on tree, so that parser.parse(new_source, tree)
+        only re-parses the changed regions rather than everything between the first and last change.
+        
+        The hunks are checked to turn old_source into exactly new_source before any edit is applied;
+        returns None (leaving tree untouched) if they do not, or if the diff has no hunks.
+        
+        Returns:
+            The applied edits in source order, as in _edit_tree_for_new_source; each edit's
+            offsets are unaffected by the edits after it
+        """
+        def line_starts(source: bytes) -> List[int]:
+            # Byte offset of every line start, plus one past a final unterminated line
+            return [0, *itertools.accumulate(len(line) + 1 for line in source.split(b'\n'))]
+        
+        def position(source: bytes, starts: List[int], line: int) -> Tuple[int, Tuple[int, int]]:
+            # Byte offset and (row, column) point of the start of a 0-based line
+            offset = starts[line]
+            if offset <= len(source):
+                return offset, (line, 0)
+            # Just past a last line without a trailing newline
+            return len(source), (line - 1, len(source) - starts[line - 1])
+        
+        try:
+            old_starts = line_starts(old_source)
+            new_starts = line_starts(new_source)
+            edits = []
+            pieces = []
+            old_offset = 0
+            for match in _HUNK_HEADER_RE.finditer(unified_diff):
+                old_start, old_length, new_start, new_length = (
+                    int(group) if group is not None else 1 for group in match.groups()
+                )
+                # A zero-length range starts after the given line
+                old_line = old_start if old_length == 0 else old_start - 1
+                new_line = new_start if new_length == 0 else new_start - 1
+                
+                start_byte, start_point = position(old_source, old_starts, old_line)
+                old_end_byte, old_end_point = position(old_source, old_starts, old_line + old_length)
+                new_start_byte, _ = position(new_source, new_starts, new_line)
+                new_end_byte, new_end_point = position(new_source, new_starts, new_line + new_length)
+                if start_byte < old_offset:
+                    return None
+                
+                pieces.append(old_source[old_offset:start_byte])
+                pieces.append(new_source[new_start_byte:new_end_byte])
+                old_offset = old_end_byte
+                
+                # Rows of the new end point are relative to the start, which earlier hunks do not move
+                # as long as the edits are applied last to first
+                new_end_point = (start_point[0] + new_end_point[0] - new_line, new_end_point[1])
+                edits.append((start_byte, old_end_byte, start_byte + new_end_byte - new_start_byte,
+                              start_point, old_end_point, new_end_point))
+        except IndexError:
+            return None  # Hunk ranges beyond the end of the sources
+        
+        pieces.append(old_source[old_offset:])
+        if not edits or b''.join(pieces) != new_source:
+            return None
+        
+        for start_byte, old_end_byte, new_end_byte, start_point, old_end_point, new_end_point in reversed(edits):
+            tree.edit(
+                start_byte=start_byte,
+                old_end_byte=old_end_byte,
+                new_end_byte=new_end_byte,
+                start_point=start_point,
+                old_end_point=old_end_point,
+                new_end_point=new_end_point
+            )
+        return edits
+
+    def _make_function_span(self, node, func_name: str, line_index: '_LineIndex', class_name: Optional[str],
+                            language_config: LanguageConfig) -> FunctionSpan:
+        """Build the FunctionSpan for a function node."""
+        # Convert byte offsets to (1-based) line numbers
+        start_line = line_index.line_at(node.start_byte)
+        end_line = line_index.line_at(node.end_byte)
+        
+        return FunctionSpan(
+            name=func_name,
+            start_byte=node.start_byte,
+            end_byte=node.end_byte,
+            start_line=start_line,
+            end_line=end_line,
+            class_name=class_name,
+            qualified_name_separator=language_config.qualified_name_separator
+        )
+
+    def _find_identifier_in_node(self, node, source: bytes, language_config: LanguageConfig) -> Optional[str]:
         """
         Find identifier name in a node, handling language-specific patterns.
         
         Args:
             node: AST node to search
-            text: Source code text
+            source: UTF-8 encoded source code the node was parsed from
             language_config: Language configuration
             
         Returns:
@@ -1139,19 +1696,19 @@ class FuncLevelDiffGenerator:
         # Direct identifier child
         for child in node.children:
             if child.type == language_config.identifier_node_type:
-                return text[child.start_byte:child.end_byte]
+                return source[child.start_byte:child.end_byte].decode('utf-8')
         
-        # For some languages, identifier might be nested (e.g., in declarators)
-        def find_identifier_recursive(n):
+        # For some languages, identifier might be nested (e.g., in declarators);
+        # search depth-first in source order with an explicit stack
+        stack = [node]
+        while stack:
+            n = stack.pop()
             if n.type == language_config.identifier_node_type:
-                return text[n.start_byte:n.end_byte]
-            for child in n.children:
-                result = find_identifier_recursive(child)
-                if result:
-                    return result
-            return None
-        
-        return find_identifier_recursive(node)
+                name = source[n.start_byte:n.end_byte].decode('utf-8')
+                if name:
+                    return name
+            stack.extend(reversed(n.children))
+        return None
 
     def __enter__(self):
         """
@@ -1178,9 +1735,33 @@ class FuncLevelDiffGenerator:
         Clean up temporary directory if it exists and cleanup is enabled.
         
         Only removes the cloned repository if it was created in a temporary directory.
-        Cached repositories are preserved for future use.
+        Cached repositories are preserved for future use; only this instance's worktree
+        is removed from them. The file-processing worker pool, if any, is shut down,
+        the in-memory blob cache is dropped and the AST cache is closed.
         Called automatically when exiting context manager.
         """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        
+        self._blob_cache.clear()
+        self._blob_cache_bytes = 0
+        self._changed_files_cache.clear()
+        self._file_changes_cache.clear()
+        self._file_diffs_cache.clear()
+        self._file_diff_cache.clear()
+        
+        if self.ast_cache is not None:
+            self.ast_cache.close()
+            self.ast_cache = None
+        
+        if self.cached_repo_path and self.repo_path:
+            self._remove_worktree(self.cached_repo_path, self.repo_path)
+            self.cached_repo_path = None
+            self.repo_path = None
+            self.repo = None
+            self.pg_repo = None
+        
         if self.cleanup_repo and self.repo_path and os.path.exists(self.repo_path):
             # For temp dirs, repo_path is like /tmp/function_diff_xyz/repo
             # We need to remove the parent temp directory
@@ -1189,14 +1770,19 @@ class FuncLevelDiffGenerator:
                 shutil.rmtree(temp_dir, ignore_errors=True)
             self.repo_path = None
             self.repo = None
+            self.pg_repo = None
     
     def clone_repository(self, repo_slug: str, host: str) -> str:
         """
         Clone a repository to either a cache directory or temporary directory using GitPython.
         
+        Repositories are cloned as blobless partial clones, without checking out any files
+        (see CLONE_OPTIONS).
+        
         If repo_cache is provided, attempts to use cached repository:
-        - If repository exists in cache, pulls latest changes
-        - If repository doesn't exist in cache, clones it there
+        - The cache holds a bare mirror per repository, shared by all generators
+        - If the mirror exists in cache, fetches latest changes; otherwise clones it there
+        - Each generator gets its own detached worktree of the mirror, removed on cleanup
         - Falls back to temporary directory if cache operations fail
         
         Args:
@@ -1204,11 +1790,13 @@ class FuncLevelDiffGenerator:
             host: Git hosting provider ('github' or 'gitlab')
             
         Returns:
-            str: Path to the repository directory
+            str: Path to the repository working tree
             
         Raises:
             git.exc.GitError: If the repository cannot be cloned
         """
+        import git
+        
         # Build repository URL based on host
         base_url = self.HOST_URLS[host]
         repo_url = f"{base_url}/{repo_slug}.git"
@@ -1224,84 +1812,228 @@ class FuncLevelDiffGenerator:
         return self._clone_to_temp_dir(repo_url)
 
     def _get_cached_repo_path(self, repo_slug: str, host: str) -> Path:
-        """Get the cache path for a repository."""
+        """Get the cache path for a repository's bare mirror."""
         owner, repo = repo_slug.split("/", 1)
-        safe_repo_name = f"{host}--{owner}--{repo}"
+        safe_repo_name = f"{host}--{owner}--{repo}.git"
         return self.repo_cache / safe_repo_name
 
     def _update_cached_repo(self, cached_repo_path: Path) -> bool:
         """
-        Update an existing cached repository.
+        Update an existing cached bare mirror.
         
         Returns:
             bool: True if successfully updated, False if repo should be re-cloned
         """
+        import git
+        from git import Repo
+        
         try:
             cached_repo = Repo(cached_repo_path)
-            self.logger.info(f"Found cached repository at {cached_repo_path}, pulling latest changes")
+            self.logger.info(f"Found cached repository at {cached_repo_path}, fetching latest changes")
             
-            # Determine and update default branch
+            # Branches are fetched straight into refs/heads (see _clone_to_cache), so HEAD
+            # follows the remote default branch without any checkout
             try:
-                origin = cached_repo.remotes.origin
-                origin.fetch()
-                
-                # Try main first, then master
-                default_branch = None
-                if 'origin/main' in [ref.name for ref in cached_repo.refs]:
-                    default_branch = 'main'
-                elif 'origin/master' in [ref.name for ref in cached_repo.refs]:
-                    default_branch = 'master'
-                
-                if default_branch:
-                    cached_repo.git.checkout(default_branch)
-                    origin.pull(default_branch)
-                    self.logger.info(f"Updated cached repository from origin/{default_branch}")
-                else:
-                    self.logger.warning("Could not determine default branch, using repository as-is")
-                    
+                cached_repo.git.fetch("origin", "--prune")
             except git.exc.GitError as e:
-                self.logger.warning(f"Could not pull latest changes: {e}, using cached repository as-is")
-                return False
+                self.logger.warning(f"Could not fetch latest changes: {e}, using cached repository as-is")
             
             return True
             
-        except git.exc.InvalidGitRepositoryError:
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
             # Not a valid git repo, remove and re-clone
             self.logger.info(f"Invalid git repository in cache, removing {cached_repo_path}")
             shutil.rmtree(cached_repo_path, ignore_errors=True)
             return False
 
     def _clone_to_cache(self, repo_url: str, repo_slug: str, host: str) -> str:
-        """Clone repository to cache directory."""
+        """Clone (or update) the bare mirror in the cache directory and add a worktree for this instance."""
+        from git import Repo
+        
         # Create cache directory if it doesn't exist
         self.repo_cache.mkdir(parents=True, exist_ok=True)
         
         cached_repo_path = self._get_cached_repo_path(repo_slug, host)
         
-        if cached_repo_path.exists():
-            if self._update_cached_repo(cached_repo_path):
-                self.cleanup_repo = False
-                return str(cached_repo_path)
+        if not (cached_repo_path.exists() and self._update_cached_repo(cached_repo_path)):
+            # Clone into cache (either new repo or after failed update)
+            self.logger.info(f"Cloning repository to cache at {cached_repo_path}")
+            cached_repo = Repo.clone_from(repo_url, cached_repo_path, bare=True, multi_options=self.CLONE_OPTIONS)
+            # A bare clone has no fetch refspec; mirror branches so later fetches update them
+            cached_repo.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
         
-        # Clone into cache (either new repo or after failed update)
-        self.logger.info(f"Cloning repository to cache at {cached_repo_path}")
-        Repo.clone_from(repo_url, cached_repo_path)
+        worktree_path = self._add_worktree(cached_repo_path, f"{cached_repo_path.stem}--")
+        self.cached_repo_path = cached_repo_path
         self.cleanup_repo = False
-        return str(cached_repo_path)
+        return worktree_path
+
+    def _add_worktree(self, bare_repo_path: Path, prefix: str) -> str:
+        """Add a detached worktree of the bare repository's HEAD next to it, without checking out files."""
+        import git
+        from git import Repo
+        
+        worktrees_dir = bare_repo_path.parent / "worktrees"
+        worktrees_dir.mkdir(parents=True, exist_ok=True)
+        worktree_path = tempfile.mkdtemp(prefix=prefix, dir=worktrees_dir)
+        
+        self.logger.info(f"Adding worktree at {worktree_path}")
+        try:
+            Repo(bare_repo_path).git.worktree("add", "--no-checkout", "--detach", worktree_path, "HEAD")
+        except git.exc.GitError:
+            shutil.rmtree(worktree_path, ignore_errors=True)
+            raise
+        return worktree_path
+
+    def shared_worktree(self) -> str:
+        """
+        Get the shared worktree of the cached mirror, for callers that want a checkout of the repository.
+        
+        Unlike this generator's own worktree, it lives at a fixed path (<cache>/worktrees/<mirror name>),
+        is reused by every generator of the same repository, in every process sharing the cache,
+        and is not removed on cleanup. Its files are checked out at the mirror's HEAD once, when it
+        is added; an existing worktree is returned as it is, since its users may have moved it to
+        other commits.
+        
+        Returns:
+            str: Path to the shared worktree
+            
+        Raises:
+            RuntimeError: If the repository is not backed by a cached mirror (no repo_cache, or
+                the cache could not be used)
+            git.exc.GitError: If the worktree cannot be added
+        """
+        import git
+        from git import Repo
+        
+        if self.cached_repo_path is None:
+            raise RuntimeError("A shared worktree requires a repository cache")
+        
+        worktree_path = self.cached_repo_path.parent / "worktrees" / self.cached_repo_path.stem
+        worktree_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = worktree_path.with_name(f"{worktree_path.name}.lock")
+        with self._shared_worktree_lock, open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                # Each MCP server process has its own generators; only one of them may add the worktree
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            
+            if worktree_path.exists():
+                try:
+                    Repo(worktree_path).git.rev_parse("--verify", "HEAD")
+                    return str(worktree_path)
+                except git.exc.GitError:
+                    # Left over from a removed mirror or an interrupted add; adds only happen under
+                    # the lock, so no other process is still creating it
+                    self.logger.info(f"Replacing invalid worktree at {worktree_path}")
+                    shutil.rmtree(worktree_path, ignore_errors=True)
+            
+            bare_repo = Repo(self.cached_repo_path)
+            bare_repo.git.worktree("prune")
+            self.logger.info(f"Adding shared worktree at {worktree_path}")
+            try:
+                bare_repo.git.worktree("add", "--detach", str(worktree_path), "HEAD")
+            except git.exc.GitError:
+                # The path did not exist before, so this is our own partly checked out worktree:
+                # do not leave it registered
+                self._remove_worktree(self.cached_repo_path, str(worktree_path))
+                raise
+        
+        return str(worktree_path)
+
+    def _remove_worktree(self, bare_repo_path: Path, worktree_path: str):
+        """Remove a worktree added by _add_worktree and prune its administrative files."""
+        import git
+        from git import Repo
+        
+        try:
+            bare_repo = Repo(bare_repo_path)
+            bare_repo.git.worktree("remove", "--force", worktree_path)
+            bare_repo.git.worktree("prune")
+        except git.exc.GitError as e:
+            self.logger.warning(f"Could not remove worktree {worktree_path}: {e}")
+            shutil.rmtree(worktree_path, ignore_errors=True)
 
     def _clone_to_temp_dir(self, repo_url: str) -> str:
         """Clone repository to temporary directory."""
+        from git import Repo
+        
         temp_dir = tempfile.mkdtemp(prefix="function_diff_")
         repo_path = os.path.join(temp_dir, "repo")
         
         self.logger.info(f"Cloning repository to temporary directory at {repo_path}")
-        Repo.clone_from(repo_url, repo_path)
+        Repo.clone_from(repo_url, repo_path, multi_options=self.CLONE_OPTIONS)
         self.cleanup_repo = True
         return repo_path
     
+    def _ensure_commit(self, commit_hash: str):
+        """
+        Make sure a commit is available locally, fetching it from origin if needed.
+        
+        Commits that are not reachable from any cloned ref (e.g. from unmerged pull requests)
+        are fetched by SHA; with the partial clone only their trees come along, not the blobs.
+        
+        Args:
+            commit_hash: The commit SHA to make available
+            
+        Raises:
+            git.exc.GitError: If the commit cannot be fetched
+        """
+        import git
+        
+        try:
+            self.repo.commit(commit_hash)
+        except (git.exc.BadName, ValueError):
+            self.logger.info(f"Commit {commit_hash} not found locally, fetching it from origin")
+            self.repo.git.fetch("origin", commit_hash)
+    
+    def _open_pygit2_repo(self, repo_path: str):
+        """
+        Open the repository with pygit2 (libgit2) for fast in-process object reads, if installed.
+        
+        Returns:
+            pygit2.Repository, or None if pygit2 is unavailable or cannot open the repository
+        """
+        try:
+            import pygit2
+            return pygit2.Repository(repo_path)
+        except ImportError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Could not open repository with pygit2: {e}, using GitPython only")
+            return None
+
+    def _read_blob_pygit2(self, commit: str, file_path: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Read a file's blob at a commit with pygit2.
+        
+        Returns:
+            (blob contents, blob SHA); (b"", None) if the file does not exist at the commit, or
+            None if the objects are not available locally (e.g. blobs not yet fetched into a
+            partial clone)
+        """
+        import pygit2
+        
+        try:
+            tree = self.pg_repo.revparse_single(commit).peel(pygit2.Commit).tree
+        except (KeyError, ValueError, pygit2.GitError):
+            return None
+        
+        try:
+            entry = tree[file_path]
+        except KeyError:
+            return b"", None
+        
+        try:
+            blob = self.pg_repo[entry.id]
+        except KeyError:
+            return None  # libgit2 does not fetch missing promisor objects; git does
+        
+        if not isinstance(blob, pygit2.Blob) or blob.size > self.MAX_BLOB_SIZE:
+            return b"", None
+        return blob.data, str(entry.id)
+
     def get_file_at_commit(self, commit: str, file_path: str) -> str:
         """
-        Get file contents at a specific commit using GitPython.
+        Get file contents at a specific commit using pygit2 if available, else GitPython.
         
         Retrieves the contents of a file as it existed at a specific commit.
         Used to compare file states before and after changes.
@@ -1311,26 +2043,287 @@ class FuncLevelDiffGenerator:
             file_path: Path to file within the repository (relative to repo root)
             
         Returns:
-            str: File contents as string, or empty string if file doesn't exist
+            str: File contents as string, or empty string if file doesn't exist,
+                is larger than MAX_BLOB_SIZE or is binary
             
         Raises:
             git.exc.GitError: If the commit reference is invalid
             UnicodeDecodeError: If the file contains non-UTF-8 content
         """
+        return self._read_source_at_commit(commit, file_path)[0].decode('utf-8')
+    
+    def _read_source_at_commit(self, commit: str, file_path: str) -> Tuple[bytes, Optional[str]]:
+        """
+        Get the UTF-8 encoded file contents at a specific commit together with the SHA of its blob.
+        
+        The contents are validated as UTF-8 but not decoded: parsing works on the bytes, and
+        only the slices that end up in the output are decoded.
+        
+        Returns:
+            Tuple of (file contents, blob SHA); the contents are empty and the SHA is None
+            wherever get_file_at_commit would return an empty string
+        """
+        import git
+        
+        blob_data = self._read_blob_pygit2(commit, file_path) if self.pg_repo is not None else None
+        
         try:
-            # Get the commit object
-            commit_obj = self.repo.commit(commit)
-            
-            # Get the file blob at this commit
-            blob = commit_obj.tree / file_path
+            if blob_data is not None:
+                data, blob_oid = blob_data
+            else:
+                # Get the commit object
+                commit_obj = self.repo.commit(commit)
+                
+                # Get the file blob at this commit
+                blob = commit_obj.tree / file_path
+                
+                # Skip oversized blobs before reading their contents (in a partial clone, reading the
+                # size already fetches a missing blob, so this saves parsing, not bandwidth)
+                if blob.size > self.MAX_BLOB_SIZE:
+                    self.logger.debug(f"Skipping {file_path} at {commit}: blob is {blob.size} bytes")
+                    return b"", None
+                
+                data = blob.data_stream.read()
+                blob_oid = blob.hexsha
             
-            # Return the file contents as string
-            return blob.data_stream.read().decode('utf-8')
+            return self._validate_source(data, blob_oid)
             
-        except (git.exc.GitError, KeyError, UnicodeDecodeError):
+        except (git.exc.GitError, KeyError):
             # File might not exist at this commit or other Git errors
-            return ""
+            return b"", None
     
+    def _validate_source(self, data: bytes, blob_oid: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Return (data, blob_oid) for UTF-8 text blobs, (b"", None) for binary or non-UTF-8 ones."""
+        if b'\0' in data[:self.BINARY_SNIFF_SIZE]:
+            return b"", None
+        
+        # Non-UTF-8 files are skipped; ASCII (most source files) needs no decoding to tell
+        if not data.isascii():
+            try:
+                data.decode('utf-8')
+            except UnicodeDecodeError:
+                return b"", None
+        
+        return data, blob_oid
+    
+    def _read_sources_at_commits(self, files: List[Tuple[str, str]]) -> List[Tuple[bytes, Optional[str]]]:
+        """
+        Read many (commit, file_path) pairs at once; equivalent to calling _read_source_at_commit on each.
+        
+        Commits must be given as full SHAs: results are kept in an LRU cache keyed by
+        (commit, file_path), so that files shared between the commits analyzed by this instance
+        (a commit's post-patch files are its child's pre-patch files) are read only once.
+        Files that pygit2 cannot read are resolved and read with two batched git cat-file
+        processes for all of them together, rather than a GitPython tree lookup per file.
+        """
+        results: List[Optional[Tuple[bytes, Optional[str]]]] = [None] * len(files)
+        pending = []
+        for index, (commit, file_path) in enumerate(files):
+            cached = self._blob_cache.get((commit, file_path))
+            if cached is not None:
+                self._blob_cache.move_to_end((commit, file_path))
+                results[index] = cached
+                continue
+            
+            blob_data = self._read_blob_pygit2(commit, file_path) if self.pg_repo is not None else None
+            if blob_data is not None:
+                results[index] = self._validate_source(*blob_data)
+            elif '\n' in file_path:
+                # Not expressible in cat-file's line-based input
+                results[index] = self._read_source_at_commit(commit, file_path)
+            else:
+                pending.append(index)
+        
+        if pending:
+            try:
+                blobs = self._cat_file_blobs([f"{files[index][0]}:{files[index][1]}" for index in pending])
+            except (OSError, subprocess.SubprocessError, ValueError) as e:
+                self.logger.warning(f"Batched blob read failed, reading files one by one: {e}")
+                blobs = [self._read_source_at_commit(*files[index]) for index in pending]
+            else:
+                blobs = [self._validate_source(*blob) for blob in blobs]
+            for index, blob in zip(pending, blobs):
+                results[index] = blob
+        
+        for key, source in zip(files, results):
+            self._cache_blob(key, source)
+        
+        return results
+    
+    def _cache_blob(self, key: Tuple[str, str], source: Tuple[bytes, Optional[str]]):
+        """Add a read file to the blob cache, evicting the least recently used ones beyond BLOB_CACHE_BYTES."""
+        if key in self._blob_cache or len(source[0]) > self.BLOB_CACHE_BYTES:
+            return
+        self._blob_cache[key] = source
+        self._blob_cache_bytes += len(source[0])
+        while self._blob_cache_bytes > self.BLOB_CACHE_BYTES:
+            _, (evicted, _) = self._blob_cache.popitem(last=False)
+            self._blob_cache_bytes -= len(evicted)
+    
+    def _cached_commit_query(self, cache: OrderedDict, key, compute: Callable[[], Any]) -> Any:
+        """Return cache[key], computing and adding it on a miss; keeps the COMMIT_CACHE_SIZE most recent keys."""
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = compute()
+        cache[key] = value
+        if len(cache) > self.COMMIT_CACHE_SIZE:
+            cache.popitem(last=False)
+        return value
+    
+    def _cat_file_blobs(self, object_names: List[str]) -> List[Tuple[bytes, Optional[str]]]:
+        """
+        Read blobs by object name (e.g. "<commit>:<path>") with git cat-file.
+        
+        One --batch-check process resolves every name to its type and size, so that missing
+        paths, non-blobs and oversized blobs are skipped without streaming their contents; one
+        --batch process then streams the remaining blobs. In a partial clone this does not avoid
+        fetching: --batch-check needs each object's header, which fetches a missing blob (on the
+        main path, diff-tree -p has already fetched them).
+        
+        Returns:
+            (contents, blob SHA) per name; (b"", None) where the name cannot be read
+        """
+        def cat_file(mode: str, names: List[str]) -> bytes:
+            return subprocess.run(
+                ["git", "-C", self.repo_path, "cat-file", mode],
+                input="".join(f"{name}\n" for name in names).encode('utf-8'),
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+            ).stdout
+        
+        headers = cat_file("--batch-check", object_names).splitlines()
+        if len(headers) != len(object_names):
+            raise ValueError(f"git cat-file returned {len(headers)} headers for {len(object_names)} objects")
+        
+        wanted = []  # (index into object_names, blob SHA)
+        for index, header in enumerate(headers):
+            # "<sha> <type> <size>", or "<name> missing" / "<name> ambiguous"
+            fields = header.split(b' ')
+            if len(fields) != 3 or fields[1] != b'blob' or not fields[2].isdigit():
+                continue
+            if int(fields[2]) > self.MAX_BLOB_SIZE:
+                self.logger.debug(f"Skipping {object_names[index]}: blob is {int(fields[2])} bytes")
+                continue
+            wanted.append((index, fields[0].decode('ascii')))
+        
+        results = [(b"", None)] * len(object_names)
+        if not wanted:
+            return results
+        
+        output = cat_file("--batch", [blob_oid for _, blob_oid in wanted])
+        offset = 0
+        for index, blob_oid in wanted:
+            header_end = output.index(b'\n', offset)
+            size = int(output[offset:header_end].rsplit(b' ', 1)[1])
+            data_start = header_end + 1
+            results[index] = (output[data_start:data_start + size], blob_oid)
+            offset = data_start + size + 1  # Each blob is followed by a newline
+        
+        return results
+    
+    def _open_ast_cache(self, cache_path: Union[str, Path]):
+        """
+        Open (creating if needed) the SQLite function span cache.
+        
+        Returns:
+            sqlite3.Connection, or None if the database cannot be opened
+        """
+        import sqlite3
+        
+        cache_path = Path(cache_path).expanduser()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(cache_path), isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            
+            # Spans cached by an older version of the extraction are dropped wholesale
+            if connection.execute("PRAGMA user_version").fetchone()[0] != self.AST_CACHE_VERSION:
+                connection.execute("DROP TABLE IF EXISTS spans")
+                connection.execute(f"PRAGMA user_version = {self.AST_CACHE_VERSION}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS spans ("
+                "blob_oid TEXT NOT NULL, lang TEXT NOT NULL, spans BLOB NOT NULL, "
+                "PRIMARY KEY (blob_oid, lang))"
+            )
+            return connection
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"Could not open AST cache at {cache_path}: {e}, parsing without cache")
+            return None
+
+    def _get_cached_spans(self, blob_oid: Optional[str], language: str) -> Optional[List[FunctionSpan]]:
+        """Look up the function spans cached for a blob, or None on a miss."""
+        if self.ast_cache is None or blob_oid is None:
+            return None
+        
+        with self._ast_cache_lock:
+            row = self.ast_cache.execute(
+                "SELECT spans FROM spans WHERE blob_oid = ? AND lang = ?", (blob_oid, language)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return [FunctionSpan(*fields) for fields in orjson.loads(row[0])]
+        except (orjson.JSONDecodeError, TypeError):
+            return None  # Malformed row, e.g. a cache file written by something else
+
+    def _cache_spans(self, blob_oid: Optional[str], language: str, spans: List[FunctionSpan]):
+        """Store the function spans extracted from a blob (as JSON arrays of plain fields)."""
+        if self.ast_cache is None or blob_oid is None:
+            return
+        
+        # JSON rather than pickle: the cache file is supplied by the caller, and loading it must not run code
+        data = orjson.dumps([span.to_tuple() for span in spans])
+        with self._ast_cache_lock:
+            self.ast_cache.execute(
+                "INSERT OR REPLACE INTO spans (blob_oid, lang, spans) VALUES (?, ?, ?)", (blob_oid, language, data)
+            )
+
+    def get_paths_and_changed_lines(self, unified_diff: str) -> Tuple[str, str, DiffRanges]:
+        """
+        Extract the a/ and b/ file paths and the changed line ranges from a unified diff in one pass.
+        
+        Only the --- / +++ header lines and the @@ hunk headers are read, with regular
+        expressions; hunk bodies are skipped.
+        
+        Args:
+            unified_diff: The unified diff string to parse (a single file)
+            
+        Returns:
+            Tuple[str, str, DiffRanges]: (a_path, b_path, changed line ranges), as returned by
+                                         get_a_and_b_paths and get_diff_changed_lines
+        """
+        first_hunk = _HUNK_HEADER_RE.search(unified_diff)
+        
+        # File headers precede the first hunk (a removed "-- x" line inside a hunk reads "--- x")
+        header = unified_diff[:first_hunk.start()] if first_hunk else unified_diff
+        source_file = _SOURCE_FILE_RE.search(header)
+        target_file = _TARGET_FILE_RE.search(header)
+        if not first_hunk or not source_file or not target_file:
+            return ("/dev/null", "/dev/null", DiffRanges(source_ranges=[], target_ranges=[]))
+        
+        source_ranges = []
+        target_ranges = []
+        for match in _HUNK_HEADER_RE.finditer(unified_diff, first_hunk.start()):
+            source_start, source_length, target_start, target_length = match.groups()
+            source_start = int(source_start)
+            target_start = int(target_start)
+            # An omitted length means a single line
+            source_length = int(source_length) if source_length is not None else 1
+            target_length = int(target_length) if target_length is not None else 1
+            
+            # Handle different types of changes:
+            # - For deletions: use source range (what was deleted)
+            # - For additions: use target range (what was added)
+            # - For modifications: both ranges are similar, use both
+            if source_length > 0:
+                source_ranges.append((source_start, source_start + source_length - 1))
+            if target_length > 0:
+                target_ranges.append((target_start, target_start + target_length - 1))
+        
+        return (source_file.group(1), target_file.group(1),
+                DiffRanges(source_ranges=source_ranges, target_ranges=target_ranges))
+
     def get_diff_changed_lines(self, unified_diff: str) -> DiffRanges:
         """
         Extract line ranges that are changed in the unified diff.
@@ -1346,38 +2339,7 @@ class FuncLevelDiffGenerator:
                 - source_ranges: line ranges in the pre-patch file 
                 - target_ranges: line ranges in the post-patch file
         """
-        try:
-            patch_set = PatchSet(unified_diff)
-            if not patch_set:
-                return DiffRanges(source_ranges=[], target_ranges=[])
-                
-            patch = patch_set[0]
-            source_ranges = []
-            target_ranges = []
-            
-            for hunk in patch:
-                # Handle different types of changes:
-                # - For deletions: use source range (what was deleted)
-                # - For additions: use target range (what was added)  
-                # - For modifications: both ranges are similar, use both
-                
-                if hunk.source_length > 0:
-                    # There's source content (deletions or modifications)
-                    source_start = hunk.source_start
-                    source_end = source_start + hunk.source_length - 1
-                    source_ranges.append((source_start, source_end))
-                
-                if hunk.target_length > 0:
-                    # There's target content (additions or modifications)
-                    target_start = hunk.target_start  
-                    target_end = target_start + hunk.target_length - 1
-                    target_ranges.append((target_start, target_end))
-                
-            return DiffRanges(source_ranges=source_ranges, target_ranges=target_ranges)
-            
-        except Exception as e:
-            raise e
-            return DiffRanges(source_ranges=[], target_ranges=[])
+        return self.get_paths_and_changed_lines(unified_diff)[2]
 
     def get_a_and_b_paths(self, unified_diff: str) -> Tuple[str, str]:
         """
@@ -1392,23 +2354,8 @@ class FuncLevelDiffGenerator:
             Tuple[str, str]: (a_path, b_path) where a_path is the source file path
                            and b_path is the target file path
         """
-        try:
-            patch_set = PatchSet(unified_diff)
-            if not patch_set:
-                return ("/dev/null", "/dev/null")
-                
-            patch = patch_set[0]
-            
-            # Get paths from the patch object
-            a_path = patch.source_file or "/dev/null"
-            b_path = patch.target_file or "/dev/null"
-                
-            return (a_path, b_path)
-            
-        except Exception as e:
-            # If parsing fails, return default paths
-            raise e
-            return ("/dev/null", "/dev/null")
+        a_path, b_path, _ = self.get_paths_and_changed_lines(unified_diff)
+        return (a_path, b_path)
 
     def function_overlaps_changes(self, func_span: FunctionSpan, changed_ranges: List[Tuple[int, int]]) -> bool:
         """
@@ -1431,35 +2378,108 @@ class FuncLevelDiffGenerator:
                 return True
         return False
 
-    def generate_function_unified_diff(self, pre_text: str, post_text: str, a_path: str, b_path: str) -> str:
+    @staticmethod
+    def _overlaps_sorted_changes(func_span: FunctionSpan, changed_ranges: List[Tuple[int, int]],
+                                 range_ends: List[int]) -> bool:
+        """
+        function_overlaps_changes for disjoint ranges in ascending order (as hunks are), by bisection.
+        
+        range_ends holds the end line of each range, in the same order.
+        """
+        # The first range ending at or after the function's start is the only candidate
+        index = bisect.bisect_left(range_ends, func_span.start_line)
+        return index < len(changed_ranges) and changed_ranges[index][0] <= func_span.end_line
+
+    def generate_function_unified_diff(self, pre_text: str, post_text: str, a_path: str, b_path: str,
+                                       context_lines: Optional[int] = None) -> str:
         """
         Generate a unified diff for a specific function.
         
         Creates a unified diff showing the changes made to a single function,
-        with full context of the entire function definition.
+        with full context of the entire function definition by default.
         
         Args:
             pre_text: Function text before changes (from commit~1)
             post_text: Function text after changes (from commit)
             a_path: Source file path
             b_path: Target file path
+            context_lines: Number of context lines around each change; None (the default)
+                          keeps the whole function as context in a single hunk
         Returns:
             str: Unified diff string showing the changes within this function,
                 with lines prefixed by -, +, or space for context
         """
         pre_lines = pre_text.splitlines(keepends=True)
         post_lines = post_text.splitlines(keepends=True)
-            
-        diff = difflib.unified_diff(
-            pre_lines,
-            post_lines,
-            fromfile=a_path,
-            tofile=b_path,
-            n=max(len(pre_lines), len(post_lines))
-        )
+        
+        if pre_lines == post_lines:
+            return ''
+        
+        opcodes = self._function_diff_opcodes(pre_lines, post_lines)
+        hunks = [opcodes] if context_lines is None else self._group_opcodes(opcodes, context_lines)
+        
+        diff = [f"--- {a_path}\n", f"+++ {b_path}\n"]
+        for hunk in hunks:
+            first, last = hunk[0], hunk[-1]
+            diff.append(
+                f"@@ -{self._format_hunk_range(first[1], last[2])} +{self._format_hunk_range(first[3], last[4])} @@\n"
+            )
+            for tag, i1, i2, j1, j2 in hunk:
+                if tag == 'equal':
+                    diff.extend(' ' + line for line in pre_lines[i1:i2])
+                    continue
+                diff.extend('-' + line for line in pre_lines[i1:i2])
+                diff.extend('+' + line for line in post_lines[j1:j2])
         
         return ''.join(diff)
 
+    @staticmethod
+    def _function_diff_opcodes(pre_lines: List[str], post_lines: List[str]) -> List[Tuple[str, int, int, int, int]]:
+        """
+        Compute difflib-style opcodes turning pre_lines into post_lines.
+        
+        The matcher runs on the whole function, not only on the region between the common
+        leading and trailing lines: trimming those changes where repeated lines are aligned,
+        and the output must stay identical to difflib.unified_diff's.
+        """
+        return _SequenceMatcher(None, pre_lines, post_lines).get_opcodes()
+
+    @staticmethod
+    def _group_opcodes(opcodes: List[Tuple[str, int, int, int, int]], context_lines: int) -> List[List[Tuple[str, int, int, int, int]]]:
+        """Split opcodes into hunks with context_lines of context, as SequenceMatcher.get_grouped_opcodes does."""
+        codes = list(opcodes)
+        if codes[0][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[0]
+            codes[0] = tag, max(i1, i2 - context_lines), i2, max(j1, j2 - context_lines), j2
+        if codes[-1][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[-1]
+            codes[-1] = tag, i1, min(i2, i1 + context_lines), j1, min(j2, j1 + context_lines)
+        
+        hunks = []
+        hunk = []
+        for tag, i1, i2, j1, j2 in codes:
+            # An unchanged run longer than twice the context ends the current hunk
+            if tag == 'equal' and i2 - i1 > 2 * context_lines:
+                hunk.append((tag, i1, min(i2, i1 + context_lines), j1, min(j2, j1 + context_lines)))
+                hunks.append(hunk)
+                hunk = []
+                i1, j1 = max(i1, i2 - context_lines), max(j1, j2 - context_lines)
+            hunk.append((tag, i1, i2, j1, j2))
+        if hunk and not (len(hunk) == 1 and hunk[0][0] == 'equal'):
+            hunks.append(hunk)
+        return hunks
+
+    @staticmethod
+    def _format_hunk_range(start: int, stop: int) -> str:
+        """Format a hunk's line range, as difflib.unified_diff does."""
+        beginning = start + 1
+        length = stop - start
+        if length == 1:
+            return f"{beginning}"
+        if not length:
+            beginning -= 1
+        return f"{beginning},{length}"
+
     def __call__(self, commit_hash: str, max_history_scan_depth: int = 0) -> List[Dict[str, str]]:
         """
         Extract per-function unified diffs from a Git commit (main contract method).
@@ -1473,18 +2493,22 @@ class FuncLevelDiffGenerator:
         """
         return self.extract_function_diffs_from_commit(commit_hash, max_history_scan_depth)
 
-    def extract_function_diffs_from_file_diff(self, pre_patch_text: str, post_patch_text: str, 
-                                             file_unified_diff: str, file_path: str) -> List[Dict[str, str]]:
+    def extract_function_diffs_from_file_diff(self, pre_patch_text: Union[str, bytes], post_patch_text: Union[str, bytes], 
+                                             file_unified_diff: str, file_path: str,
+                                             pre_blob_oid: Optional[str] = None,
+                                             post_blob_oid: Optional[str] = None) -> List[Dict[str, str]]:
         """
         Extract per-function unified diffs from a single file-level diff.
         
         Now detects the file's language and uses the appropriate parser and config.
         
         Args:
-            pre_patch_text: The complete contents of the file before applying the patch
-            post_patch_text: The complete contents of the file after applying the patch
+            pre_patch_text: The complete contents of the file before applying the patch (text or UTF-8 bytes)
+            post_patch_text: The complete contents of the file after applying the patch (text or UTF-8 bytes)
             file_unified_diff: The unified diff for the file
             file_path: Path to the file (used for language detection)
+            pre_blob_oid: Optional blob SHA of the pre-patch file, used as AST cache key
+            post_blob_oid: Optional blob SHA of the post-patch file, used as AST cache key
             
         Returns:
             List of dictionaries with function diff information
@@ -1495,44 +2519,84 @@ class FuncLevelDiffGenerator:
             return []  # Unknown language, skip
             
         # Get parser and config for this language
-        parser = self.parsers.get(file_language)
+        parser = self._get_thread_parser(file_language)
         language_config = self.language_configs.get(file_language)
+        language_runtime = self.language_runtimes.get(file_language)
         
         if not parser or not language_config:
             # Parser not available for this language
             return []
             
-        # Parse both versions to get function spans
-        pre_functions = self.extract_functions_from_ast(pre_patch_text, parser, language_config)
-        post_functions = self.extract_functions_from_ast(post_patch_text, parser, language_config)
-        
-        # Get changed line ranges from the diff
-        diff_ranges: DiffRanges = self.get_diff_changed_lines(file_unified_diff)
+        # Parse both versions to get function spans (offsets are into the UTF-8 encoded sources)
+        pre_source = pre_patch_text.encode('utf-8') if isinstance(pre_patch_text, str) else pre_patch_text
+        post_source = post_patch_text.encode('utf-8') if isinstance(post_patch_text, str) else post_patch_text
+        pre_tree = None
+        pre_functions = self._get_cached_spans(pre_blob_oid, file_language)
+        if pre_functions is None:
+            pre_tree = parser.parse(pre_source)
+            pre_functions = self._extract_functions_from_tree(pre_tree, pre_source, language_config, language_runtime)
+            self._cache_spans(pre_blob_oid, file_language, pre_functions)
+        
+        post_functions = self._get_cached_spans(post_blob_oid, file_language)
+        if post_functions is None:
+            # The post-patch parse reuses the pre-patch tree: only the edited regions are re-parsed.
+            # Error recovery can differ from a fresh parse's, so a tree that already has errors
+            # (routine for C/C++ macros) is not reused: the post-patch source is parsed fresh, once
+            span_reuse = None
+            if pre_tree is not None and pre_source and post_source and not pre_tree.root_node.has_error:
+                edits = self._edit_tree_for_hunks(pre_tree, pre_source, post_source, file_unified_diff)
+                if edits is None:
+                    edits = self._edit_tree_for_new_source(pre_tree, pre_source, post_source)
+                post_tree = parser.parse(post_source, pre_tree)
+                if post_tree.root_node.has_error:
+                    # The patch introduced an error; keep the result independent of pre_tree
+                    post_tree = parser.parse(post_source)
+                else:
+                    # Functions away from the edits keep their pre-patch spans, shifted
+                    span_reuse = _SpanReuse(pre_functions, edits, pre_tree.changed_ranges(post_tree))
+            else:
+                post_tree = parser.parse(post_source)
+            post_functions = self._extract_functions_from_tree(post_tree, post_source, language_config, language_runtime,
+                                                               span_reuse)
+            self._cache_spans(post_blob_oid, file_language, post_functions)
         
-        # Get the a and b paths from the file_unified_diff
-        a_path, b_path = self.get_a_and_b_paths(file_unified_diff)
+        # Get the a and b paths and the changed line ranges from the file_unified_diff
+        a_path, b_path, diff_ranges = self.get_paths_and_changed_lines(file_unified_diff)
         
-        # Find functions that overlap with changes
+        # Find functions that overlap with changes (hunk ranges are disjoint and in order)
         affected_functions = []
+        source_ends = [end_line for _, end_line in diff_ranges.source_ranges]
+        target_ends = [end_line for _, end_line in diff_ranges.target_ranges]
         
         # Create a mapping of function names to spans for post-patch
         post_func_map = {func.qualified_name: func for func in post_functions}
+        pre_func_names = set()
         
         for pre_func in pre_functions:
+            pre_func_names.add(pre_func.qualified_name)
+            
             # Compare pre-patch functions against source ranges
-            if self.function_overlaps_changes(pre_func, diff_ranges.source_ranges):
+            if self._overlaps_sorted_changes(pre_func, diff_ranges.source_ranges, source_ends):
                 # Find corresponding function in post-patch
                 post_func = post_func_map.get(pre_func.qualified_name)
                 
                 # Extract function text from both versions
-                pre_func_text = pre_patch_text[pre_func.start_byte:pre_func.end_byte]
+                pre_func_bytes = pre_source[pre_func.start_byte:pre_func.end_byte]
                 
                 if post_func:
-                    post_func_text = post_patch_text[post_func.start_byte:post_func.end_byte]
+                    post_func_bytes = post_source[post_func.start_byte:post_func.end_byte]
+                    
+                    # Functions inside a hunk are often untouched (e.g. next to an import or
+                    # whitespace edit); a byte comparison skips decoding and diffing them
+                    if pre_func_bytes == post_func_bytes:
+                        continue
+                    post_func_text = post_func_bytes.decode('utf-8')
                 else:
                     # Function was deleted
                     post_func_text = ""
                 
+                pre_func_text = pre_func_bytes.decode('utf-8')
+                
                 # Generate per-function unified diff
                 func_diff = self.generate_function_unified_diff(
                     pre_func_text,
@@ -1548,14 +2612,12 @@ class FuncLevelDiffGenerator:
                     })
         
         # Also check for newly added functions in post-patch
-        pre_func_names = {func.qualified_name for func in pre_functions}
-        
         for post_func in post_functions:
             if (post_func.qualified_name not in pre_func_names and 
-                self.function_overlaps_changes(post_func, diff_ranges.target_ranges)):
+                self._overlaps_sorted_changes(post_func, diff_ranges.target_ranges, target_ends)):
                 
                 # This is a newly added function
-                post_func_text = post_patch_text[post_func.start_byte:post_func.end_byte]
+                post_func_text = post_source[post_func.start_byte:post_func.end_byte].decode('utf-8')
                 
                 func_diff = self.generate_function_unified_diff(
                     "",  # No pre-patch text for new function
@@ -1588,8 +2650,11 @@ class FuncLevelDiffGenerator:
                 - file_path: The path to the file that contains the function
                 - file_language: The language of the file
         """
+        
         all_function_diffs = []
         
+        self._ensure_commit(commit_hash)
+        
         # Step 1: Find the first interesting commit
         if max_history_scan_depth:
             interesting_commit = self._get_interesting_commit(commit_hash, max_history_scan_depth)
@@ -1599,17 +2664,17 @@ class FuncLevelDiffGenerator:
         if interesting_commit is None:
             return []
         
-        # Step 2: Load parsers for all languages in this commit
-        self._load_parsers_for_commit(interesting_commit)
+        # Step 2: List the changed files, without their patches
+        commit_obj = self.repo.commit(interesting_commit)
+        interesting_commit = commit_obj.hexsha
+        file_changes = self._list_file_changes(interesting_commit)
         
-        # Step 3: Get all changed files with their diffs
-        file_diffs = self.get_changed_files_with_diffs(interesting_commit)
-        
-        if not file_diffs:
+        if not file_changes:
             return []
         
-        # Step 4: Process each changed file with its appropriate parser
-        for file_path, file_diff_str in tqdm(file_diffs.items(), desc="Processing files", unit="files", disable=self.silent, leave=False):
+        # Step 3: Keep the files of known languages that are not ignored, and load their parsers
+        file_paths = []
+        for _, file_path in file_changes:
             # Detect file language
             file_language = self._detect_file_language(file_path)
             if not file_language:
@@ -1619,35 +2684,70 @@ class FuncLevelDiffGenerator:
             language_for_ignore = self._get_language_config(file_language)
             if language_for_ignore and self._matches_ignore_patterns(file_path, language_for_ignore.name):
                 continue
-                
-            # Check if we have a parser for this language
-            if file_language not in self.parsers:
-                continue  # No parser available
-                
+            
+            file_paths.append(file_path)
+        
+        for language in self._detect_languages_in_files(file_paths):
+            self._load_parser(language)
+        
+        # Step 4: Get the diffs of the files with an available parser, and read their contents
+        # (repository access stays on this thread; GitPython objects are not thread-safe).
+        # Both sides are named by full SHA, as keys of the blob cache
+        file_paths = [file_path for file_path in file_paths if self._detect_file_language(file_path) in self.parsers]
+        file_diffs = self.get_changed_files_with_diffs(interesting_commit, file_paths) if file_paths else {}
+        pre_commit = commit_obj.parents[0].hexsha
+        candidates = []
+        for file_path, file_diff_str in file_diffs.items():
+            if not file_diff_str.strip():
+                continue
+            
+            candidates.append((file_path, self._detect_file_language(file_path), file_diff_str))
+        
+        # Get file contents (and blob SHAs, for the AST cache) of both versions in one batch
+        sources = self._read_sources_at_commits(
+            [(pre_commit, file_path) for file_path, _, _ in candidates] +
+            [(interesting_commit, file_path) for file_path, _, _ in candidates]
+        )
+        work_items = [
+            (file_path, file_language, file_diff_str, pre_source, post_source, pre_blob_oid, post_blob_oid)
+            for (file_path, file_language, file_diff_str), (pre_source, pre_blob_oid), (post_source, post_blob_oid)
+            in zip(candidates, sources[:len(candidates)], sources[len(candidates):])
+        ]
+        
+        # Step 5: Extract per-function diffs for each file with its appropriate parser
+        def process_file(item):
+            file_path, file_language, file_diff_str, pre_source, post_source, pre_blob_oid, post_blob_oid = item
             try:
-                # Get file contents for AST parsing
-                pre_commit = f"{interesting_commit}~1"
-                pre_patch_text = self.get_file_at_commit(pre_commit, file_path)
-                post_patch_text = self.get_file_at_commit(interesting_commit, file_path)
-                
-                # Extract per-function diffs for this file
-                if file_diff_str.strip():
-                    function_level_diffs = self.extract_function_diffs_from_file_diff(
-                        pre_patch_text, post_patch_text, file_diff_str, file_path
-                    )
-                    
-                    # Add file path and language to each function diff
-                    for diff in function_level_diffs:
-                        diff.update({
-                            "file_path": file_path,
-                            "file_language": file_language
-                        })
-                    
-                    all_function_diffs.extend(function_level_diffs)
-                    
-            except (git.exc.GitError, UnicodeDecodeError) as e:
+                function_level_diffs = self.extract_function_diffs_from_file_diff(
+                    pre_source, post_source, file_diff_str, file_path, pre_blob_oid, post_blob_oid
+                )
+            except UnicodeDecodeError as e:
                 print(f"Warning: Could not process file {file_path}: {e}")
-                continue
+                return []
+            
+            # Add file path and language to each function diff
+            for diff in function_level_diffs:
+                diff.update({
+                    "file_path": file_path,
+                    "file_language": file_language
+                })
+            return function_level_diffs
+        
+        if self.max_workers > 1 and len(work_items) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="diffops")
+            results = self._executor.map(process_file, work_items)
+        else:
+            results = map(process_file, work_items)
+        
+        # In silent mode the results are consumed directly, without importing tqdm at all
+        if not self.silent:
+            from tqdm import tqdm
+            results = tqdm(results, total=len(work_items), desc="Processing files", unit="files",
+                           leave=False, mininterval=0.5, smoothing=0.0)
+        
+        for function_level_diffs in results:
+            all_function_diffs.extend(function_level_diffs)
         
         if len(all_function_diffs) == 0:
             raise ValueError("No function diffs found")
@@ -1667,37 +2767,124 @@ class FuncLevelDiffGenerator:
             
         Returns:
             List[str]: List of file paths that were changed in the commit,
-                      relative to repository root
+                      relative to repository root. The paths are interned, as the
+                      same files recur across the commits of a history scan
             
         Raises:
             git.exc.GitError: If the commit hash is invalid or not found
         """
+        # Copied so callers may modify the list without affecting the cache
+        return list(self._cached_commit_query(
+            self._changed_files_cache, commit_hash, lambda: self._list_changed_files(commit_hash)
+        ))
+    
+    def _list_changed_files(self, commit_hash: str) -> List[str]:
+        """Uncached get_changed_files."""
+        import git
+        
+        # Tree-to-tree diff in libgit2, without running git or building per-file diff objects
+        changed_files = self._changed_files_pygit2(commit_hash) if self.pg_repo is not None else None
+        if changed_files is not None:
+            return changed_files
+        
         try:
             # Get the commit object
             commit_obj = self.repo.commit(commit_hash)
             
             # Get changed files by comparing with parent
             if commit_obj.parents:
-                # Compare with first parent
-                parent_commit = commit_obj.parents[0]
-                diffs = parent_commit.diff(commit_obj, create_patch=False)
-                
-                changed_files = []
-                for diff in diffs:
-                    # Handle different types of changes
-                    if diff.a_path:  # File was modified or deleted
-                        changed_files.append(diff.a_path)
-                    elif diff.b_path:  # File was added
-                        changed_files.append(diff.b_path)
-                
-                return list(set(changed_files))  # Remove duplicates
+                # Renamed files are listed by their old path, which a file added in its place
+                # would repeat; ordered dedup keeps git's path order
+                return list(dict.fromkeys(old_path for old_path, _ in self._list_file_changes(commit_obj.hexsha)))
             else:
-                # Root commit - all files are "changed"
-                return [item.path for item in commit_obj.tree.traverse() if item.type == 'blob']
+                # Root commit - all files are "changed"; entries read "<mode> <type> <sha>\t<path>"
+                entries = self.repo.git.ls_tree("-r", "-z", commit_obj.hexsha).split("\0")
+                return [
+                    sys.intern(entry.split("\t", 1)[1]) for entry in entries
+                    if entry and entry.split(" ", 2)[1] == "blob"
+                ]
                 
         except git.exc.GitError as e:
             raise e
 
+    def _list_file_changes(self, commit_hash: str) -> List[Tuple[str, str]]:
+        """
+        List the files changed in a commit, compared with its first parent, without their patches.
+        
+        Renames are detected as in get_changed_files_with_diffs, so the new paths are the keys
+        of its result.
+        
+        Args:
+            commit_hash: The commit SHA to analyze
+            
+        Returns:
+            List of (old path, new path) in diff order; the paths only differ for renames.
+            Empty for root commits
+        """
+        return self._cached_commit_query(
+            self._file_changes_cache, commit_hash, lambda: self._read_file_changes(commit_hash)
+        )
+    
+    def _read_file_changes(self, commit_hash: str) -> List[Tuple[str, str]]:
+        """Uncached _list_file_changes."""
+        commit_obj = self.repo.commit(commit_hash)
+        if not commit_obj.parents:
+            return []
+        
+        # Only names and statuses are listed, NUL-separated
+        fields = self.repo.git.diff_tree(
+            "-r", "-z", "--name-status", "-M", commit_obj.parents[0].hexsha, commit_obj.hexsha
+        ).split("\0")
+        
+        file_changes = []
+        index = 0
+        while index + 1 < len(fields):
+            status = fields[index]
+            # Renames and copies list the source path and then the destination
+            old_path = sys.intern(fields[index + 1])
+            if status[:1] in ("R", "C"):
+                file_changes.append((old_path, sys.intern(fields[index + 2])))
+                index += 3
+            else:
+                file_changes.append((old_path, old_path))
+                index += 2
+        
+        return file_changes
+    
+    def _changed_files_pygit2(self, commit_hash: str) -> Optional[List[str]]:
+        """
+        List the files changed in a commit with pygit2, as get_changed_files does with GitPython.
+        
+        Renames are detected (like GitPython's diff, which passes -M) and reported by their old path.
+        
+        Returns:
+            List of changed file paths, or None if pygit2 cannot produce it (unknown commit, or
+            blobs needed for rename detection not yet fetched into a partial clone)
+        """
+        import pygit2
+        
+        try:
+            commit_obj = self.pg_repo.revparse_single(commit_hash).peel(pygit2.Commit)
+            
+            if commit_obj.parents:
+                # Only paths are needed: skip loading blobs to flag binary files. Type changes are
+                # kept as one delta, as git diff reports them
+                diff = self.pg_repo.diff(
+                    commit_obj.parents[0].tree, commit_obj.tree,
+                    flags=pygit2.GIT_DIFF_SKIP_BINARY_CHECK | pygit2.GIT_DIFF_INCLUDE_TYPECHANGE
+                )
+                diff.find_similar(flags=pygit2.GIT_DIFF_FIND_RENAMES)
+                # A renamed file's old path can reappear as a file added in its place
+                return list(dict.fromkeys(sys.intern(delta.old_file.path or delta.new_file.path) for delta in diff.deltas))
+            
+            # Root commit - all files (but not submodules) are "changed"
+            return [
+                sys.intern(delta.new_file.path) for delta in commit_obj.tree.diff_to_tree(swap=True).deltas
+                if delta.new_file.mode != pygit2.GIT_FILEMODE_COMMIT
+            ]
+        except (KeyError, ValueError, pygit2.GitError):
+            return None
+
     def get_file_diff_from_commit(self, commit_hash: str, file_path: str) -> str:
         """
         Get the unified diff for a specific file from a Git commit using GitPython.
@@ -1712,6 +2899,15 @@ class FuncLevelDiffGenerator:
         Raises:
             git.exc.GitError: If the commit hash is invalid or not found
         """
+        return self._cached_commit_query(
+            self._file_diff_cache, (commit_hash, file_path),
+            lambda: self._read_file_diff(commit_hash, file_path)
+        )
+    
+    def _read_file_diff(self, commit_hash: str, file_path: str) -> str:
+        """Uncached get_file_diff_from_commit."""
+        import git
+        
         try:
             # Get the commit object
             commit_obj = self.repo.commit(commit_hash)
@@ -1739,12 +2935,14 @@ class FuncLevelDiffGenerator:
         except (git.exc.GitError, UnicodeDecodeError) as e:
             raise e
 
-    def get_changed_files_with_diffs(self, commit_hash: str) -> Dict[str, str]:
+    def get_changed_files_with_diffs(self, commit_hash: str, file_paths: Optional[List[str]] = None) -> Dict[str, str]:
         """
         Get both the list of changed files and their unified diffs from a commit.
         
         Args:
             commit_hash: The commit SHA to analyze
+            file_paths: Only generate the diffs of these changed files (new paths, as keyed in
+                the result); None for all files
             
         Returns:
             Dict[str, str]: Dictionary mapping file paths to their unified diff strings
@@ -1752,43 +2950,129 @@ class FuncLevelDiffGenerator:
         Raises:
             git.exc.GitError: If the commit hash is invalid or not found
         """
-        try:
-            # Get the commit object
-            commit_obj = self.repo.commit(commit_hash)
-            
-            if not commit_obj.parents:
-                # Root commit - all files are "added"
-                return {}
-            
-            # Get diffs with patches
-            parent_commit = commit_obj.parents[0]
-            # List of diffs, one per file changed
-            diffs = parent_commit.diff(commit_obj, create_patch=True)
-            
-            file_diffs = {}
-            for diff in diffs:
-                # Get the file path (prioritize b_path for new files, a_path for others)
-                file_path = diff.b_path if diff.b_path else diff.a_path
-                
-                if file_path and diff.diff:
-                    try:
-                        diff_text = diff.diff.decode('utf-8')
-                        a_path = f"--- a/{diff.a_path}" if diff.a_path else '--- /dev/null'
-                        b_path = f"+++ b/{diff.b_path}" if diff.b_path else '+++ /dev/null'
-                        
-                        # Prepend diff headers
-                        header = f"{a_path}\n{b_path}\n"
-                        full_diff = header + diff_text
-
-                        file_diffs[file_path] = full_diff
-                    except UnicodeDecodeError:
-                        # Skip binary files or files with encoding issues
-                        continue
+        key = (commit_hash, tuple(file_paths) if file_paths is not None else None)
+        # Copied so callers may modify the dict without affecting the cache
+        return dict(self._cached_commit_query(
+            self._file_diffs_cache, key, lambda: dict(self.iter_changed_files_with_diffs(commit_hash, file_paths))
+        ))
+    
+    def iter_changed_files_with_diffs(self, commit_hash: str, file_paths: Optional[List[str]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Yield the changed files of a commit with their unified diffs, as they are read from git.
+        
+        Uncached, streamed version of get_changed_files_with_diffs: one git diff-tree process
+        lists the changes (with exact, unquoted paths) followed by their patches, and each file
+        is yielded as soon as its patch has been read.
+        
+        Args:
+            commit_hash: The commit SHA to analyze
+            file_paths: Only generate the diffs of these changed files; None for all files
             
-            return file_diffs
+        Yields:
+            Tuple[str, str]: File path (the new path of renamed files) and its unified diff
             
-        except git.exc.GitError as e:
-            raise e
+        Raises:
+            git.exc.GitError: If the commit hash is invalid or not found
+        """
+        commit_obj = self.repo.commit(commit_hash)
+        
+        if not commit_obj.parents:
+            # Root commit - all files are "added"
+            return
+        
+        # Limit patch generation to the requested files. Both paths of a rename are passed, so
+        # that it is still detected; ":(literal)" keeps glob characters in names from matching
+        wanted = None
+        pathspecs = []
+        if file_paths is not None:
+            wanted = set(file_paths)
+            for old_path, new_path in self._list_file_changes(commit_obj.hexsha):
+                if new_path in wanted:
+                    pathspecs.append(f":(literal){new_path}")
+                    if old_path != new_path:
+                        pathspecs.append(f":(literal){old_path}")
+            if not pathspecs:
+                return
+        
+        # Renames are detected as GitPython's diff does (-M). With -z the raw listing is
+        # NUL-separated and ends with an empty field, before the patches in the same order
+        proc = self.repo.git.diff_tree(
+            "-r", "-M", "--raw", "-p", "-z", "--no-color", "--no-ext-diff",
+            commit_obj.parents[0].hexsha, commit_obj.hexsha, "--", *pathspecs, as_process=True
+        )
+        stream = proc.stdout
+        
+        raw = b""
+        for line in stream:
+            raw += line
+            if b"\0\0" in raw:
+                break
+        raw, _, first_line = raw.partition(b"\0\0")
+        
+        # Raw entries read ":<modes> <SHAs> <status>", then one path (two for renames)
+        changes = []
+        fields = raw.split(b"\0") if raw else []
+        index = 0
+        while index + 1 < len(fields):
+            status = fields[index].rsplit(b" ", 1)[-1][:1]
+            old_path = fields[index + 1].decode("utf-8", "surrogateescape")
+            if status in (b"R", b"C"):
+                new_path = fields[index + 2].decode("utf-8", "surrogateescape")
+                index += 3
+            else:
+                new_path = old_path
+                index += 2
+            # A type change (e.g. file to symlink) is shown as a deletion and an addition
+            changes.extend([(old_path, new_path)] * (2 if status == b"T" else 1))
+        
+        changes = iter(changes)
+        patch_lines = [first_line] if first_line else []
+        for line in itertools.chain(stream, [None]):
+            if patch_lines and (line is None or line.startswith(b"diff --git ")):
+                old_path, new_path = next(changes)
+                if wanted is None or new_path in wanted:
+                    file_diff = self._file_diff_from_patch(patch_lines, old_path, new_path)
+                    if file_diff is not None:
+                        yield new_path, file_diff
+                patch_lines = []
+            if line is not None:
+                patch_lines.append(line)
+        
+        # Raises GitCommandError if git failed
+        proc.wait()
+    
+    @staticmethod
+    def _file_diff_from_patch(patch_lines: List[bytes], old_path: str, new_path: str) -> Optional[str]:
+        """
+        Convert one file's patch from git diff into the unified diff get_changed_files_with_diffs
+        returns: "--- a/<old path>" and "+++ b/<new path>" lines (or /dev/null), then the hunks.
+        
+        Returns:
+            The unified diff, or None if the patch has no content (mode changes, pure renames)
+            or is not valid UTF-8
+        """
+        # Skip the extended header; files without "---"/"+++" lines (binary) keep both paths
+        start = 1
+        while start < len(patch_lines) and patch_lines[start].startswith(_PATCH_HEADER_PREFIXES):
+            if patch_lines[start] == b"--- /dev/null\n":
+                old_path = None
+            elif patch_lines[start] == b"+++ /dev/null\n":
+                new_path = None
+            start += 1
+        
+        if start == len(patch_lines):
+            return None
+        
+        try:
+            diff_text = b"".join(patch_lines[start:]).decode('utf-8')
+        except UnicodeDecodeError:
+            # Skip binary files or files with encoding issues
+            return None
+        
+        # Prepend diff headers
+        a_path = f"--- a/{old_path}" if old_path else '--- /dev/null'
+        b_path = f"+++ b/{new_path}" if new_path else '+++ /dev/null'
+        return f"{a_path}\n{b_path}\n{diff_text}"
 
     def _is_code_file(self, file_path: str, lang: str = "python") -> bool:
         """
@@ -1806,20 +3090,12 @@ class FuncLevelDiffGenerator:
             bool: True if the file appears to be a source code file that should
                  be processed for function extraction
         """
-        # First check if the file matches ignore patterns
-        if self._matches_ignore_patterns(file_path, lang):
+        # First check if it has a code extension, which is cheaper than the ignore patterns
+        if _lower_extension(file_path, _MAX_CODE_EXT_LEN) not in _CODE_EXTENSIONS:
             return False
         
-        # Then check if it has a code extension
-        code_extensions = {
-            '.py', '.pxi', '.pyi', '.js', '.ts', '.jsx', '.tsx', '.java', '.c', '.cpp', '.cc', '.cxx', 
-            '.h', '.hpp', '.hxx', '.cs', '.rs', '.go', '.php', '.rb', '.swift', 
-            '.kt', '.scala', '.sh', '.bash', '.zsh', '.fish', '.ps1', '.m', '.mm',
-            '.r', '.R', '.jl', '.hs', '.elm', '.clj', '.cljs', '.fs', '.fsx', '.ml', '.mli'
-        }
-        
-        _, ext = os.path.splitext(file_path.lower())
-        return ext in code_extensions
+        # Then check if the file matches ignore patterns
+        return not self._matches_ignore_patterns(file_path, lang)
 
     def _matches_ignore_patterns(self, filepath: str, lang: str = "python") -> bool:
         """
@@ -1841,27 +3117,91 @@ class FuncLevelDiffGenerator:
             
         # Normalize path separators
         normalized_path = filepath.replace('\\', '/')
+        matchers = self._get_ignore_matchers(lang)
         
-        # Check directory patterns
-        for pattern in self.ignore_patterns[lang]:
-            if fnmatch.fnmatch(normalized_path, pattern):
-                return True
-            # Also check if any parent directory matches
-            parts = normalized_path.split('/')
-            for i in range(len(parts)):
-                partial_path = '/'.join(parts[:i+1])
-                if fnmatch.fnmatch(partial_path + '/', pattern):
-                    return True
-        
-        # Check file patterns
-        if lang in self.ignore_file_patterns:
-            filename = os.path.basename(normalized_path)
-            for pattern in self.ignore_file_patterns[lang]:
-                if fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(normalized_path, pattern):
+        # Check directory patterns, against the path as a file and as a directory
+        if matchers.dir_matcher.match(normalized_path) or matchers.dir_matcher.match(normalized_path + '/'):
+            return True
+        # Also check if any parent directory matches
+        if matchers.dir_prefix_matcher is not None:
+            # Each prefix up to a '/' is matched in place, through match()'s end position
+            dir_path = normalized_path + '/'
+            end = dir_path.find('/')
+            while end >= 0:
+                if matchers.dir_prefix_matcher.match(dir_path, 0, end + 1):
                     return True
+                end = dir_path.find('/', end + 1)
+        
+        # Check file patterns: literal names and extensions by set lookup, then prefix and suffix
+        # globs, then the remaining globs. Like the globs, prefixes are matched against the full
+        # path as well as the file name
+        filename = os.path.basename(normalized_path)
+        dot = filename.rfind('.')
+        if filename in matchers.file_literals or (dot >= 0 and filename[dot:] in matchers.file_extensions):
+            return True
+        if (filename.endswith(matchers.file_suffixes) or filename.startswith(matchers.file_prefixes)
+                or normalized_path.startswith(matchers.file_prefixes)):
+            return True
+        if matchers.file_matcher is not None:
+            if matchers.file_matcher.match(filename) or matchers.file_matcher.match(normalized_path):
+                return True
         
         return False
 
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_ignore_matchers(cls, lang: str) -> _IgnoreMatchers:
+        """
+        Get the compiled directory and file ignore matchers for a language.
+        
+        Each set of glob patterns is translated with fnmatch and joined into a single
+        regex, so a path is checked with one regex match instead of one fnmatch call per pattern.
+        A directory pattern ending in '*' that matches a parent directory ("docs/") also matches
+        the full path ("docs/api/index.py"), and one ending in another literal never matches a
+        directory; only the remaining ones ('build/', 'out?') need a match per parent directory.
+        File patterns that are plain names (setup.py), extensions (*.md), prefixes (README*)
+        or other suffixes (*.min.js) are split off first and checked with set lookups (the
+        extension being the file name from its last dot) and str.startswith/endswith.
+        Matchers are built once per class and language and shared by all instances.
+        
+        Args:
+            lang: Programming language context (python, javascript, java, etc.)
+            
+        Returns:
+            _IgnoreMatchers; the parent directory and remaining file matchers are None if
+            they have no patterns
+        """
+        def compile_patterns(patterns):
+            return re.compile("|".join(fnmatch.translate(pattern) for pattern in sorted(patterns)))
+        
+        literals, extensions, prefixes, suffixes, residual = set(), set(), [], [], []
+        for pattern in sorted(cls.ignore_file_patterns.get(lang, ())):
+            if '/' in pattern:
+                residual.append(pattern)
+            elif not _GLOB_MAGIC.search(pattern):
+                literals.add(pattern)
+            elif pattern.startswith('*.') and not _GLOB_MAGIC.search(pattern[1:]) and pattern.count('.') == 1:
+                extensions.add(pattern[1:])
+            elif pattern.startswith('*') and not _GLOB_MAGIC.search(pattern[1:]):
+                suffixes.append(pattern[1:])
+            elif pattern.endswith('*') and not _GLOB_MAGIC.search(pattern[:-1]):
+                prefixes.append(pattern[:-1])
+            else:
+                residual.append(pattern)
+        
+        dir_patterns = cls.ignore_patterns[lang]
+        prefix_patterns = [pattern for pattern in dir_patterns if pattern.endswith(('/', '?', ']'))]
+        
+        return _IgnoreMatchers(
+            dir_matcher=compile_patterns(dir_patterns),
+            dir_prefix_matcher=compile_patterns(prefix_patterns) if prefix_patterns else None,
+            file_literals=frozenset(literals),
+            file_extensions=frozenset(extensions),
+            file_prefixes=tuple(prefixes),
+            file_suffixes=tuple(suffixes),
+            file_matcher=compile_patterns(residual) if residual else None
+        )
+
     def _is_interesting_commit(self, changed_files: List[str]) -> bool:
         """
         Check if a commit is interesting by examining all files with appropriate language patterns.
@@ -1881,19 +3221,68 @@ class FuncLevelDiffGenerator:
         
         return False
 
+    def _scan_history_for_interesting_commit(self, commit_hash: str, max_history_scan_depth: int) -> Optional[str]:
+        """
+        Find the first interesting commit along the first-parent chain from one git log process.
+        
+        The changed files of up to max_history_scan_depth commits are streamed (compared with
+        their first parent, renames listed by their old path, as get_changed_files does), and
+        git is stopped as soon as an interesting commit is found.
+        """
+        command = [
+            "git", "-C", self.repo_path, "log", "-m", "--first-parent", "--root", "-M", "-z",
+            "--name-status", "--format=%H", f"--max-count={max_history_scan_depth}", commit_hash
+        ]
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+            try:
+                # Fields: a commit SHA, then a status (the first one after a newline) and one
+                # path, two for renames and copies, per changed file
+                current_commit, changed_files = None, set()
+                fields = _read_nul_fields(proc.stdout)
+                for field in fields:
+                    status = field.lstrip(b"\n")
+                    if _NAME_STATUS_RE.match(status):
+                        changed_files.add(sys.intern(next(fields).decode("utf-8", "surrogateescape")))
+                        if status[:1] in (b"R", b"C"):
+                            next(fields)
+                        continue
+                    
+                    if current_commit is not None and self._is_interesting_commit(list(changed_files)):
+                        return current_commit
+                    current_commit, changed_files = field.decode(), set()
+                
+                if current_commit is not None and self._is_interesting_commit(list(changed_files)):
+                    return current_commit
+                return None
+            finally:
+                proc.kill()
+
     def _get_interesting_commit(self, commit_hash: str, max_history_scan_depth: int = 25) -> Optional[str]:
         """
         Find the first interesting commit (no longer tied to a single language).
         """
+        import git
+        
         try:
             current_commit = self.repo.commit(commit_hash)
             commits_checked = 0
             
+            # Without pygit2, each step would run git; list the whole first-parent chain at once
+            if self.pg_repo is None:
+                return self._scan_history_for_interesting_commit(current_commit.hexsha, max_history_scan_depth)
+            
+            # Otherwise walk pygit2 commits, whose changed files are diffed in-process too
+            try:
+                current_commit = self.pg_repo[current_commit.hexsha]
+            except (KeyError, ValueError):
+                return self._scan_history_for_interesting_commit(current_commit.hexsha, max_history_scan_depth)
+            
             while commits_checked < max_history_scan_depth:
-                changed_files = self.get_changed_files(current_commit.hexsha)
+                commit_sha = str(current_commit.id)
+                changed_files = self.get_changed_files(commit_sha)
                 
                 if self._is_interesting_commit(changed_files):
-                    return current_commit.hexsha
+                    return commit_sha
                 
                 commits_checked += 1
                 
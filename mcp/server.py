@@ -4,18 +4,32 @@ FastMCP quickstart example.
 cd to the `examples/snippets/clients` directory and run:
     uv run server fastmcp_quickstart stdio
 """
-import re
+import os
+import subprocess
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from mcp.server.fastmcp import FastMCP
-from git import Repo
 from diffops import FuncLevelDiffGenerator
 
 
 # Create an MCP server
 mcp = FastMCP("output-formatters")
 
+# Characters of a hexadecimal commit SHA
+_HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+# File paths under the user's home directory are user-specific
+_HOME_PREFIX = os.path.join(str(Path.home()), "")
+
+# pygit2 repositories opened by CommitExists, by real path, least recently used first.
+# Handles are reused across calls but never used by two threads at once
+_PYGIT2_REPOS_SIZE = 32
+_pygit2_repos = OrderedDict()
+_pygit2_repos_lock = threading.Lock()
+
 
 class RepoCloneResponse(BaseModel):
     """Response from the RepoCloner tool."""
@@ -36,6 +50,49 @@ class Vulnerability(BaseModel):
     diff_url: str = Field(description="The URL of the diff that fixed the vulnerability.")
     affected_versions: List[str] = Field(description="The versions of the library that are affected by the vulnerability.")
 
+    @field_validator("file_path")
+    @classmethod
+    def check_file_path(cls, file_path: str) -> str:
+        if file_path == "":
+            raise ValueError("File path is empty. Please provide a valid file path for the vulnerable function.")
+        if file_path.startswith(_HOME_PREFIX):
+            raise ValueError(f"Possible security issue: The file path ({file_path}) contains a user-specific path. Do not include any absolute or user-specific paths.")
+        if os.path.isabs(file_path):
+            raise ValueError(f"The file path ({file_path}) is absolute. Please provide the path relative to the repository root.")
+        return file_path
+
+    @field_validator("function_name")
+    @classmethod
+    def check_function_name(cls, function_name: str) -> str:
+        if function_name == "":
+            raise ValueError("Function name is empty. Please provide a valid function name for the vulnerable function.")
+        return function_name
+
+    @field_validator("commit_sha")
+    @classmethod
+    def check_commit_sha(cls, commit_sha: str) -> str:
+        if commit_sha == "":
+            raise ValueError("Commit SHA is empty. Please provide a valid commit SHA for the vulnerable function.")
+        # Check if the commit sha is valid (is hexadecimal and between 7-40 characters long):
+        # nothing may be left once its hex digits are deleted
+        if not (7 <= len(commit_sha) <= 40 and commit_sha.isascii() and not commit_sha.encode().translate(None, _HEX_DIGITS)):
+            raise ValueError(f"Commit SHA ({commit_sha}) is invalid. Please provide the valid commit SHA for the vulnerable function. It should be a hexadecimal string between 7-40 characters long.")
+        return commit_sha
+
+    @field_validator("diff_url")
+    @classmethod
+    def check_diff_url(cls, diff_url: str) -> str:
+        if diff_url == "":
+            raise ValueError("Diff URL is empty. Please provide a valid diff URL for the vulnerable function.")
+        return diff_url
+
+    @field_validator("affected_versions")
+    @classmethod
+    def check_affected_versions(cls, affected_versions: List[str]) -> List[str]:
+        if affected_versions == []:
+            raise ValueError("Affected versions is empty. Please provide a valid list of affected versions for the vulnerable function.")
+        return affected_versions
+
 
 @mcp.tool(name="VulnerableFunctionSearchFormatter")
 def vulnerable_function_presentation(vulnerabilities: List[Vulnerability]) -> str:
@@ -44,32 +101,11 @@ def vulnerable_function_presentation(vulnerabilities: List[Vulnerability]) -> st
     Raises:
         ValueError: If the input formatting has any issues.
     """
-    if len(vulnerabilities) < 1:
+    if not vulnerabilities:
         return "Input formatting is incorrect. Please provide a list of vulnerabilities."
 
-    for vuln in vulnerabilities:
-        if vuln.file_path == "":
-            raise ValueError("File path is empty. Please provide a valid file path for the vulnerable function.")
-        else:
-            if vuln.file_path.startswith(str(Path.home())):
-                raise ValueError(f"Possible security issue: The file path ({vuln.file_path}) contains a user-specific path. Do not include any absolute or user-specific paths.")
-
-        if vuln.function_name == "":
-            raise ValueError("Function name is empty. Please provide a valid function name for the vulnerable function.")
-
-        if vuln.commit_sha == "":
-            raise ValueError("Commit SHA is empty. Please provide a valid commit SHA for the vulnerable function.")
-        else:
-            # Check if the commit sha is valid (is hexadecimal and between 7-40 characters long)
-            if not re.match(r'^[a-fA-F0-9]{7,40}$', vuln.commit_sha):
-                raise ValueError(f"Commit SHA ({vuln.commit_sha}) is invalid. Please provide the valid commit SHA for the vulnerable function. It should be a hexadecimal string between 7-40 characters long.")
-        
-        if vuln.diff_url == "":
-            raise ValueError("Diff URL is empty. Please provide a valid diff URL for the vulnerable function.")
-        
-        if vuln.affected_versions == []:
-            raise ValueError("Affected versions is empty. Please provide a valid list of affected versions for the vulnerable function.")
-    
+    # Each vulnerability's fields are checked by the Vulnerability model's validators as the
+    # input is parsed, so an invalid one never reaches this point
     return "Input formatting is correct. Please proceed with the analysis."
 
 
@@ -89,21 +125,75 @@ def repo_cloner(repo_slug: str, host: str = "github") -> RepoCloneResponse:
     if not cache.exists():
         cache.mkdir(parents=True, exist_ok=True)
 
-    try:        
+    try:
+        # The generator only clones or updates the cached mirror and is cleaned up (with its own
+        # worktree); the checkout handed back is the mirror's shared worktree, reused across calls
         with FuncLevelDiffGenerator.create(repo_slug, repo_cache=cache, host=host) as generator:
-            return RepoCloneResponse(repo_path=generator.repo_path, clone_success=True)
+            repo_path = generator.shared_worktree()
+        return RepoCloneResponse(repo_path=repo_path, clone_success=True)
     except Exception as e:
         return RepoCloneResponse(repo_path="", clone_success=False)
 
 
+def _open_pygit2_repo(repo_path: str):
+    """Get the cached pygit2 repository at a path, opening it on first use (with _pygit2_repos_lock held).
+
+    Returns None if pygit2 is unavailable or cannot open the repository.
+    """
+    try:
+        import pygit2
+    except ImportError:
+        return None
+
+    path = os.path.realpath(repo_path)
+    repo = _pygit2_repos.get(path)
+    if repo is not None:
+        _pygit2_repos.move_to_end(path)
+        return repo
+
+    try:
+        repo = pygit2.Repository(path)
+    except (pygit2.GitError, OSError, ValueError):
+        return None
+    _pygit2_repos[path] = repo
+    if len(_pygit2_repos) > _PYGIT2_REPOS_SIZE:
+        _pygit2_repos.popitem(last=False)
+    return repo
+
+
 @mcp.tool(name="CommitExists")
 def commit_exists(repo_path: str, commit_sha: str) -> CommitExistsResponse:
     """Checks if a commit exists in a repository."""
+    # Object database lookup in the cached pygit2 repository, if available
+    with _pygit2_repos_lock:
+        repo = _open_pygit2_repo(repo_path)
+        if repo is not None:
+            import pygit2
+            try:
+                repo.revparse_single(f"{commit_sha}^{{commit}}")
+                return CommitExistsResponse(commit_exists=True, error_msg="")
+            except KeyError:
+                # Not found; confirmed below, in case the cached handle predates the repository
+                pass
+            except (ValueError, pygit2.GitError) as e:
+                return CommitExistsResponse(commit_exists=False, error_msg=str(e))
+
+    # Otherwise resolve the name (full or abbreviated SHA, ref) to a commit with git itself
     try:
-        Repo(repo_path).commit(commit_sha)
-        return CommitExistsResponse(commit_exists=True, error_msg="")
-    except Exception as e:
+        result = subprocess.run(
+            ["git", "-C", repo_path, "rev-parse", "--verify", "--quiet", "--end-of-options",
+             f"{commit_sha}^{{commit}}"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+    except OSError as e:
         return CommitExistsResponse(commit_exists=False, error_msg=str(e))
+    
+    if result.returncode == 0:
+        return CommitExistsResponse(commit_exists=True, error_msg="")
+    return CommitExistsResponse(
+        commit_exists=False,
+        error_msg=result.stderr.strip() or f"Commit {commit_sha} not found in {repo_path}"
+    )
 
 
 def main():